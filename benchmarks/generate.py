@@ -0,0 +1,126 @@
+"""
+Creates synthetic SQLite databases for the benchmarks.
+
+The database has a chain of tables connected with foreign keys, like city and
+district in test.db: level0 is the top table, every row of level{n} has
+fanout rows in level{n+1} pointing to it with parent_id. The last level is
+capped at max_rows. Padding tables extra0, extra1, ... make the schema large
+without adding rows to the chain.
+
+    python benchmarks/generate.py bench.db --depth 3 --top 1000 --fanout 100 --tables 2000
+
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+
+def levelRows(depth, top, fanout, max_rows=None):
+    """
+    Number of rows of each level of the chain.
+
+    """
+    rows = [top * fanout ** level for level in range(depth)]
+    if max_rows is not None:
+        rows = [min(count, max_rows) for count in rows]
+    return rows
+
+
+def generate(path, depth=3, top=100, fanout=10, max_rows=None, tables=0, extra_rows=10, batch_size=10000):
+    """
+    Create the database at path, replacing an existing file.
+
+    Parameters
+    ----------
+
+    path : str
+        Database file name.
+
+    depth : int, optional
+        Number of tables in the foreign key chain. Default is 3
+
+    top : int, optional
+        Number of rows of level0. Default is 100
+
+    fanout : int, optional
+        Number of child rows of every row. Default is 10
+
+    max_rows : int, optional
+        Upper limit of the rows of every level.
+
+    tables : int, optional
+        Number of padding tables. Default is 0
+
+    extra_rows : int, optional
+        Number of rows of every padding table. Default is 10
+
+    batch_size : int, optional
+        Number of rows per executemany call. Default is 10000
+
+    Returns
+    -------
+    Layout : dict
+        The parameters, the row count of each level and the generation time.
+
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    started = time.perf_counter()
+    conn = sqlite3.connect(path)
+    conn.execute("pragma journal_mode = off")
+    conn.execute("pragma synchronous = off")
+    counts = levelRows(depth, top, fanout, max_rows)
+    for level, count in enumerate(counts):
+        name = f"level{level}"
+        if level == 0:
+            conn.execute(f"create table {name} (id integer not null, name varchar, primary key (id))")
+            rows = ((i, f"{name} {i}") for i in range(1, count + 1))
+            insert = f"insert into {name} (id, name) values (?, ?)"
+        else:
+            parent = f"level{level - 1}"
+            conn.execute(f"create table {name} (id integer not null, name varchar, parent_id integer, "
+                         f"primary key (id), foreign key(parent_id) references {parent} (id))")
+            # spread the children evenly over the parents
+            parents = counts[level - 1]
+            rows = ((i, f"{name} {i}", (i - 1) % parents + 1) for i in range(1, count + 1))
+            insert = f"insert into {name} (id, name, parent_id) values (?, ?, ?)"
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                conn.executemany(insert, batch)
+                batch = []
+        if batch:
+            conn.executemany(insert, batch)
+        if level > 0:
+            conn.execute(f"create index {name}_parent_id on {name} (parent_id)")
+    for number in range(tables):
+        name = f"extra{number}"
+        conn.execute(f"create table {name} (id integer not null, name varchar, value float, "
+                     f"level0_id integer, primary key (id), foreign key(level0_id) references level0 (id))")
+        conn.executemany(f"insert into {name} (id, name, value, level0_id) values (?, ?, ?, ?)",
+                         ((i, f"{name} {i}", i / 2, i % top + 1) for i in range(1, extra_rows + 1)))
+    conn.commit()
+    conn.close()
+    return {"path": path, "depth": depth, "top": top, "fanout": fanout, "max_rows": max_rows,
+            "tables": tables, "extra_rows": extra_rows, "level_rows": counts,
+            "seconds": time.perf_counter() - started}
+
+
+def addArguments(parser):
+    parser.add_argument("--depth", type=int, default=3, help="tables in the foreign key chain")
+    parser.add_argument("--top", type=int, default=100, help="rows of the top table")
+    parser.add_argument("--fanout", type=int, default=10, help="child rows of every row")
+    parser.add_argument("--max-rows", type=int, default=None, help="row limit of every table")
+    parser.add_argument("--tables", type=int, default=0, help="padding tables")
+    parser.add_argument("--extra-rows", type=int, default=10, help="rows of every padding table")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create a synthetic SQLite database for the benchmarks.")
+    parser.add_argument("path")
+    addArguments(parser)
+    args = parser.parse_args()
+    layout = generate(args.path, args.depth, args.top, args.fanout, args.max_rows, args.tables, args.extra_rows)
+    print(f"{args.path}: {layout['level_rows']} rows, {args.tables} padding tables, {layout['seconds']:.1f} s")
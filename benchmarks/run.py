@@ -0,0 +1,248 @@
+"""
+Times the widgets on a synthetic database and writes the results as JSON.
+
+Runs without a display, with QT_QPA_PLATFORM=offscreen. Every case is run
+repeat times for the timings, and once more under tracemalloc for the peak
+Python memory. tracemalloc does not see the memory Qt allocates, like the
+QTableWidgetItems, so the peak resident size of the process is recorded as
+well: "rss_peak_bytes" after the case and "rss_growth_bytes", how much the case
+raised it. The database is created with generate.py unless --db names an
+existing file.
+
+Progress goes to standard error, the JSON report to standard output or --output.
+
+    python benchmarks/run.py --top 1000 --fanout 100 --tables 500 --output results.json
+
+Cases
+-----
+
+extract, extract_lazy
+    DBSQLite.extract() of the whole schema, and with lazy=True.
+
+combobox_fill, combobox_fill_cached
+    DBComboBox on level0, created with an empty lookup cache, then fill() again from the cache.
+
+tablewidget
+    DBTableWidget on level1, reading the whole table.
+
+combobox_refill, tablewidget_refill
+    Detail widgets on the last two levels following a master combobox, refill()
+    for --samples master ids. "latency" has the time of a single refill.
+
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# the benchmarks run from a checkout, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide2.QtWidgets import QApplication, QWidget
+from dbwidgets import DBSQLite
+from dbwidgets.widgets import DBComboBox, DBTableWidget
+from generate import generate, addArguments
+
+
+def peakRSS():
+    """
+    Peak resident set size of the process in bytes, None where it cannot be read.
+
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def summary(values):
+    return {"min": min(values), "median": statistics.median(values), "mean": statistics.mean(values),
+            "max": max(values), "count": len(values)}
+
+
+class Benchmark:
+    """
+    Runs the cases on one database and collects the results.
+
+    Attributes
+    ----------
+    path : str
+        Database file name.
+
+    depth : int
+        Number of tables in the foreign key chain.
+
+    repeat : int
+        Number of timed runs of every case.
+
+    samples : int
+        Number of master ids for the refill cases.
+
+    results : dict
+        Results by case name.
+
+    """
+
+    def __init__(self, path, depth, repeat=5, samples=20):
+        self.path = path
+        self.depth = depth
+        self.repeat = repeat
+        self.samples = samples
+        self.results = {}
+        self.db = DBSQLite(path)
+        self.db.extract()
+        self.parent = None
+
+    def close(self):
+        self.db.close()
+
+    def coldCache(self):
+        self.db.lookups.clear()
+        self.db.record_cache.clear()
+        self.db.lookup_versions.clear()
+
+    def case(self, name, setup, run):
+        """
+        Time run(state) repeat times, state is the value returned by setup().
+        If run returns a list of latencies they are summarized too.
+
+        """
+        times = []
+        latencies = []
+        queries = 0
+        rss_before = peakRSS()
+        for _ in range(self.repeat):
+            # a new parent for every run, the widgets of the previous run are deleted with their parent
+            self.parent = QWidget()
+            state = setup()
+            before = self.db.stats()["count"]
+            started = time.perf_counter()
+            latency = run(state)
+            times.append(time.perf_counter() - started)
+            queries = self.db.stats()["count"] - before
+            if isinstance(latency, list):
+                latencies.extend(latency)
+            QApplication.processEvents()
+        self.parent = QWidget()
+        state = setup()
+        tracemalloc.start()
+        run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        QApplication.processEvents()
+        rss = peakRSS()
+        result = {"seconds": summary(times), "peak_bytes": peak, "queries": queries, "rss_peak_bytes": rss,
+                  "rss_growth_bytes": None if rss is None else rss - rss_before}
+        if latencies:
+            result["latency"] = summary(latencies)
+        self.results[name] = result
+        print(f"{name:24s} {result['seconds']['median'] * 1000:10.1f} ms {peak / 1048576:8.1f} MiB"
+              + ("" if rss is None else f" rss {rss / 1048576:8.1f} MiB"), file=sys.stderr, flush=True)
+
+    def masterIds(self, level):
+        count = self.db.execute(f"select count(*) from level{level}")[0][0]
+        step = max(1, count // self.samples)
+        return list(range(1, count + 1, step))[:self.samples]
+
+    def widget(self, cls, *args):
+        return cls(QWidget(self.parent), self.db, *args)
+
+    def runAll(self):
+        def extract(lazy):
+            db = DBSQLite(self.path)
+            db.extract(lazy=lazy)
+            db.close()
+
+        self.case("extract", lambda: None, lambda state: extract(False))
+        self.case("extract_lazy", lambda: None, lambda state: extract(True))
+
+        self.case("combobox_fill", self.coldCache,
+                  lambda state: self.widget(DBComboBox, "level0", "name", "id"))
+        self.case("combobox_fill_cached", lambda: self.widget(DBComboBox, "level0", "name", "id"),
+                  lambda combo: combo.fill())
+
+        if self.depth > 1:
+            self.case("tablewidget", self.coldCache, lambda state: self.widget(DBTableWidget, "level1"))
+            self.refillCase("combobox_refill", DBComboBox, self.depth - 2, ("name", "id"))
+            self.refillCase("tablewidget_refill", DBTableWidget, self.depth - 2, ())
+
+    def refillCase(self, name, cls, master_level, args):
+        ids = self.masterIds(master_level)
+
+        def setup():
+            self.coldCache()
+            master = self.widget(DBComboBox, f"level{master_level}", "name", "id")
+            detail = self.widget(cls, f"level{master_level + 1}", *args)
+            detail.setMaster(master, "parent_id")
+            return detail
+
+        def run(detail):
+            latencies = []
+            for id_value in ids:
+                started = time.perf_counter()
+                detail.refill(id_value)
+                latencies.append(time.perf_counter() - started)
+            return latencies
+
+        self.case(name, setup, run)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time dbwidgets on a synthetic SQLite database.")
+    parser.add_argument("--db", help="existing database to use, created by generate.py")
+    addArguments(parser)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs of every case")
+    parser.add_argument("--samples", type=int, default=20, help="master ids for the refill cases")
+    parser.add_argument("--output", help="JSON file for the results, default is standard output")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    layout = None
+    path = args.db
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="dbwidgets_bench_"), "bench.db")
+        layout = generate(path, args.depth, args.top, args.fanout, args.max_rows, args.tables, args.extra_rows)
+        print(f"generated {layout['level_rows']} rows in {layout['seconds']:.1f} s", file=sys.stderr, flush=True)
+    depth = args.depth
+    if layout is None:
+        db = DBSQLite(path)
+        depth = len([name for name in db.tableNames() if name.startswith("level")])
+        db.close()
+
+    benchmark = Benchmark(path, depth, args.repeat, args.samples)
+    try:
+        benchmark.runAll()
+    finally:
+        benchmark.close()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "database": layout if layout is not None else {"path": path},
+        "repeat": args.repeat,
+        "samples": args.samples,
+        "results": benchmark.results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if layout is not None:
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
@@ -4,9 +4,89 @@ use of this database object.
 
 """
 
+import csv
+import datetime
+import decimal
+import io
+import ipaddress
+import itertools
+import json
+import logging
+import numbers
+import os
 import psycopg2
+import psycopg2.pool
+import re
 import sqlite3
+import sys
+import threading
+import time
 import traceback as tb
+import uuid
+import weakref
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+logger = logging.getLogger("dbwidgets")
+
+INTEGER_TYPE = re.compile(r"\b(int|integer|int[248]|tinyint|smallint|mediumint|bigint|(small|big)?serial[248]?)\b")
+
+
+def fetchBlocks(cur, block_size=1000):
+    """
+    Generator reading the rows of an executed cursor with fetchmany, block_size
+    rows at a time. Yields lists of records, so the whole result is never in memory.
+
+    """
+    while True:
+        records = cur.fetchmany(block_size)
+        if not records:
+            return
+        yield records
+
+
+def exportBlocks(path, blocks, header, format="csv"):
+    """
+    Write blocks of records to path as they arrive, see fetchBlocks. Only one
+    block is in memory at a time.
+
+    Parameters
+    ----------
+    path : str
+        File to write.
+
+    blocks : iterable
+        Lists of records, like DB.streamBlocks returns.
+
+    header : list
+        Column names. First line of a csv file, keys of the jsonl objects.
+
+    format : str
+        csv, or jsonl for one JSON object per line. Values json cannot
+        represent, like dates, are written as text.
+
+    Returns
+    -------
+    Number of records : int
+        Number of records written.
+
+    """
+    if format not in ("csv", "jsonl"):
+        raise Exception(f"Unknown export format {format}, use csv or jsonl.")
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        if format == "csv":
+            writer = csv.writer(fh)
+            writer.writerow(header)
+            for records in blocks:
+                writer.writerows(records)
+                count += len(records)
+        else:
+            for records in blocks:
+                fh.writelines(json.dumps(dict(zip(header, record)), default=str, ensure_ascii=False) + "\n" for record in records)
+                count += len(records)
+    return count
 
 
 class Column:
@@ -103,6 +183,97 @@ class Column:
 
         self.join_type = join_type
 
+    def convert(self, value):
+        """Convert value, usually text typed by the user, to the Python type of the column.
+        Empty text is None for columns other than text columns. numeric and
+        decimal text becomes Decimal, so no digits are lost. Values that are
+        not text are checked against the column type and returned as they are.
+        Text for date and time, uuid, network address and json columns is
+        checked and returned as text, for the database to parse.
+
+        Raises ValueError if the value is not valid for the column type.
+
+        """
+        datatype = (self.datatype or "").lower()
+        # arrays like integer[] are passed as they are
+        array = datatype.endswith("]")
+        integer = not array and INTEGER_TYPE.search(datatype) is not None
+        exact = not array and not integer and ("numeric" in datatype or "decimal" in datatype)
+        real = not array and not integer and not exact and any(t in datatype for t in ("real", "floa", "doub"))
+        if not isinstance(value, str):
+            if value is None:
+                return None
+            if integer and not isinstance(value, numbers.Integral):
+                raise ValueError(f"Not an integer value for {self.name} : {value!r}")
+            if (real or exact) and not isinstance(value, numbers.Number):
+                raise ValueError(f"Not a number for {self.name} : {value!r}")
+            return value
+        if value == "" and "char" not in datatype and "text" not in datatype:
+            return None
+        if integer:
+            return int(value)
+        if exact:
+            try:
+                return decimal.Decimal(value.strip())
+            except decimal.InvalidOperation:
+                raise ValueError(f"Not a number for {self.name} : {value}")
+        if real:
+            return float(value)
+        if "bool" in datatype and not array:
+            if value.lower() in ("1", "t", "true", "yes"):
+                return True
+            if value.lower() in ("0", "f", "false", "no"):
+                return False
+            raise ValueError(f"Not a boolean value for {self.name} : {value}")
+        if not array:
+            self.check(datatype, value.strip())
+        return value
+
+    def check(self, datatype, value):
+        # parse text the database would reject, only to raise ValueError before it is sent
+        try:
+            if "timestamp" in datatype or "datetime" in datatype:
+                datetime.datetime.fromisoformat(value)
+            elif "date" in datatype:
+                datetime.date.fromisoformat(value)
+            elif datatype.startswith("time"):
+                datetime.time.fromisoformat(value.split("+")[0].split("-")[0])
+            elif datatype == "uuid":
+                uuid.UUID(value)
+            elif datatype == "inet":
+                ipaddress.ip_interface(value)
+            elif datatype == "cidr":
+                ipaddress.ip_network(value)
+            elif "json" in datatype:
+                json.loads(value)
+        except ValueError:
+            raise ValueError(f"Not a valid {datatype} value for {self.name} : {value}")
+
+    def asDict(self):
+        """Return the column definition as a dict of plain values, used for the schema cache.
+
+        """
+        return {"name": self.name,
+                "datatype": self.datatype,
+                "default": self.default,
+                "primary_key": self.primary_key,
+                "foreign_key_table": self.foreign_key_table,
+                "foreign_key_column": self.foreign_key_column,
+                "foreign_key_join_column": self.foreign_key_join_column,
+                "join_type": self.join_type}
+
+    @classmethod
+    def fromDict(cls, values):
+        """Create a column from a dict returned by asDict.
+
+        """
+        col = cls(values["name"], values["datatype"], primary_key=values["primary_key"], default=values["default"])
+        col.foreign_key_table = values["foreign_key_table"]
+        col.foreign_key_column = values["foreign_key_column"]
+        col.foreign_key_join_column = values["foreign_key_join_column"]
+        col.join_type = values["join_type"]
+        return col
+
     def __str__(self):
         pkey = ""
         if self.primary_key is True:
@@ -127,18 +298,25 @@ class Table:
     columns : dict
         Columns of the table as a dict. Column name as key values.
 
+    db : DB or None
+        Database the table belongs to.
+
     """
 
-    def __init__(self, tablename):
+    def __init__(self, tablename, db=None):
         """
         Parameters
         ----------
         tablename : str
             Name of the table.
 
+        db : DB, optional
+            Database the table belongs to.
+
         """
         self.name = tablename
         self.columns = {}
+        self.db = db
 
     def addColumn(self, column):
         """
@@ -173,7 +351,26 @@ class Table:
         cursor.execute(query_string)
         return cursor.fetchall()
 
-    def query(self, cur, condition=None):
+    def freeform_query_stream(self, cursor, query_string, block_size=1000):
+        """
+        Generator variant of freeform_query, yields the records one by one while
+        reading them block_size at a time. Use a cursor from DB.streamCursor to
+        keep the rows on the server with Postgresql.
+
+        """
+        cursor.execute(query_string)
+        for records in fetchBlocks(cursor, block_size):
+            yield from records
+
+    def primaryKey(self):
+        """
+        Return the names of the primary key columns, in column order.
+        Empty list if the table has no primary key.
+
+        """
+        return [col.name for col in self.columns.values() if col.primary_key]
+
+    def query(self, cur, condition=None, params=None):
         """
         Execute a query, using the cursor provided. Default query is
 
@@ -190,18 +387,146 @@ class Table:
         condition : str or None
             Conditions to append to the end of the query.
 
+        params : sequence or None
+            Values for the placeholders in condition.
+
         Returns
         -------
         List of records : list
             List of records
 
         """
+        query_string = f"select * from {self.name}"
         if condition is not None:
-            cur.execute(f"select * from {self.name} {condition}")
+            query_string = f"{query_string} {condition}"
+        if params is not None:
+            cur.execute(query_string, params)
         else:
-            cur.execute(f"select * from {self.name}")
+            cur.execute(query_string)
         return cur.fetchall()
 
+    def query_stream(self, cur, condition=None, params=None, block_size=1000):
+        """
+        Generator variant of query, yields the records one by one while reading
+        them block_size at a time. Use a cursor from DB.streamCursor to keep the
+        rows on the server with Postgresql.
+
+        """
+        query_string = f"select * from {self.name}"
+        if condition is not None:
+            query_string = f"{query_string} {condition}"
+        if params is not None:
+            cur.execute(query_string, params)
+        else:
+            cur.execute(query_string)
+        for records in fetchBlocks(cur, block_size):
+            yield from records
+
+    def asDict(self):
+        """Return the table definition as a dict of plain values, used for the schema cache.
+
+        """
+        return {"name": self.name, "columns": [col.asDict() for col in self.columns.values()]}
+
+    @classmethod
+    def fromDict(cls, values, db=None):
+        """Create a table from a dict returned by asDict.
+
+        """
+        t = cls(values["name"], db)
+        for col in values["columns"]:
+            t.addColumn(Column.fromDict(col))
+        return t
+
+    def export(self, path, format="csv", condition=None, params=None, block_size=1000):
+        """
+        Write the rows of the table to path. Rows are streamed from the
+        database to the file block_size at a time, so memory use stays the same
+        for any table size, see DB.streamBlocks.
+
+        Parameters
+        ----------
+        path : str
+            File to write.
+
+        format : str
+            csv with a header line of the column names, or jsonl.
+
+        condition : str or None
+            Predicate to filter the rows, without WHERE.
+
+        params : sequence or None
+            Values for the placeholders in condition.
+
+        block_size : int
+            Number of rows read with each fetchmany.
+
+        Returns
+        -------
+        Number of rows : int
+            Number of rows written.
+
+        """
+        if self.db is None:
+            raise Exception(f"Table {self.name} is not attached to a database, cannot export.")
+        query_string = f"select * from {self.name}"
+        if condition is not None:
+            query_string += f" where {condition}"
+        blocks = self.db.streamBlocks(query_string, params, block_size)
+        return exportBlocks(path, blocks, list(self.columns.keys()), format)
+
+    def bulkInsert(self, rows, batch_size=1000, columns=None, progress=None):
+        """
+        Insert many rows in one transaction. Rows are sent in batches of
+        batch_size, with executemany on SQLite and COPY FROM STDIN on
+        Postgresql. If a row fails, nothing is inserted.
+
+        Every row is checked against the Column objects before it is sent: it
+        must have a value for each column, and the values must suit the column
+        types. Text is converted like typed text, see Column.convert.
+
+        Parameters
+        ----------
+        rows : iterable
+            Sequences of values in the order of columns, or dicts with column names as keys.
+
+        batch_size : int
+            Number of rows sent to the database at a time.
+
+        columns : list or None
+            Names of the columns given in rows. Default is all columns of the table in order.
+
+        progress : callable or None
+            Called with the number of rows inserted so far after each batch.
+
+        Returns
+        -------
+        Number of rows : int
+            Number of rows inserted.
+
+        """
+        if self.db is None:
+            raise Exception(f"Table {self.name} is not attached to a database, cannot insert.")
+        if columns is None:
+            columns = list(self.columns.keys())
+        for name in columns:
+            if name not in self.columns:
+                raise Exception(f"Column {name} not found in {self.name}")
+        cols = [self.columns[name] for name in columns]
+
+        def checked():
+            for n, row in enumerate(rows):
+                if isinstance(row, dict):
+                    row = [row.get(name) for name in columns]
+                if len(row) != len(cols):
+                    raise Exception(f"Row {n} of {self.name} has {len(row)} values, {len(cols)} columns expected")
+                try:
+                    yield tuple(col.convert(value) for col, value in zip(cols, row))
+                except ValueError as e:
+                    raise Exception(f"Row {n} of {self.name} : {e}")
+
+        return self.db._bulkInsert(self.name, columns, checked(), batch_size, progress)
+
     def tbprint(self):
         """Print a report of the table, lists column descriptions.
 
@@ -212,248 +537,2442 @@ class Table:
         print("-" * 30)
 
 
-class DB:
+class LazyTables(MutableMapping):
     """
-    This class represents the base Database class. New classes for
-    individual databases like sqlite or postgresql inherits this class.
+    Dictionary of tables that reads the schema of a table from the database
+    only when that table is accessed for the first time. Table names are
+    known from the start, so keys(), len() and ``in`` never query the database.
+    values() and items() load every table.
+
+    Attributes
+    ----------
+    loader : callable
+        Called with a table name, returns the Table object.
+
+    names : list
+        Names of the tables in the database.
+
+    loaded : dict
+        Tables read so far, table name as key.
+
+    """
+
+    def __init__(self, loader, names):
+        self.loader = loader
+        self.names = list(names)
+        self.nameset = set(self.names)
+        self.loaded = {}
 
+    def __getitem__(self, name):
+        if name not in self.loaded:
+            if name not in self.nameset:
+                raise KeyError(name)
+            self.loaded[name] = self.loader(name)
+        return self.loaded[name]
+
+    def __setitem__(self, name, table):
+        if name not in self.nameset:
+            self.names.append(name)
+            self.nameset.add(name)
+        self.loaded[name] = table
+
+    def __delitem__(self, name):
+        if name not in self.nameset:
+            raise KeyError(name)
+        self.names.remove(name)
+        self.nameset.discard(name)
+        self.loaded.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self.nameset
+
+    def __iter__(self):
+        return iter(list(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+
+class KeysetPager:
+    """
+    Reads a table page by page in primary key order. A page is located by
+    comparing the primary key with the last key of the previous page,
+
+        SELECT * FROM tablename WHERE pk > ? ORDER BY pk LIMIT page_size
+
+    so reading a page in the middle of a large table costs the same as reading
+    the first page. OFFSET is never used. Composite primary keys are compared
+    as row values, (a, b) > (?, ?).
 
     Attributes
     ----------
-    host : str
-        Host name of the server that database is running. None for SQLite. Default is None
+    db : DB
+        Database to read from.
 
-    port : int
-        Port number for the database service. None for SQLite. Default is None
+    table : Table
+        Table to read.
 
-    dbname : str
-        Name of the database
+    keys : list
+        Primary key column names of the table.
 
-    tables : dict
-        Dictionary of tables in the database. Key value is table name.
+    page_size : int
+        Maximum number of rows in a page.
 
-    connection : Connection handle
-        Connection handle to database.
+    condition : str or None
+        Extra predicate, without WHERE, applied to every page.
 
-    filename : str
-        Name of the database file. Valid for SQLite. Default is None
+    params : tuple
+        Values for the placeholders in condition.
 
     """
 
-    def __init__(self, host=None, port=None, dbname=None, filename=None):
-        self.host = host
-        self.port = port
-        self.dbname = dbname
-        self.tables = {}
-        self.connection = None
-        self.filename = filename
+    def __init__(self, db, tablename, page_size=100, condition=None, params=()):
+        self.db = db
+        self.table = db.tables[tablename]
+        self.keys = self.table.primaryKey()
+        if len(self.keys) == 0:
+            raise Exception(f"Table {tablename} has no primary key, keyset paging is not possible.")
+        colnames = list(self.table.columns.keys())
+        self.keyindex = [colnames.index(k) for k in self.keys]
+        self.page_size = page_size
+        self.condition = condition
+        self.params = tuple(params)
+
+    def key(self, record):
+        """
+        Return the primary key of a record read by this pager as a tuple.
 
-    def report(self):
         """
-        Print the extracted database schema to standart output
+        return tuple(record[i] for i in self.keyindex)
 
+    def first(self):
         """
-        print(f"DATABASE {self.dbname} ")
-        for tb in self.tables.values():
-            tb.tbprint()
+        Return the first page of the table.
 
-    def execute(self, query_string):
         """
-        Execute a query given by query_string, using the cursor provided.
+        return self.page(None, ">", False)
+
+    def last(self):
+        """
+        Return the last page of the table.
+
+        """
+        return self.page(None, "<", True)
+
+    def after(self, key):
+        """
+        Return the page of records following key.
+
+        """
+        return self.page(key, ">", False)
+
+    def before(self, key):
+        """
+        Return the page of records preceding key.
+
+        """
+        return self.page(key, "<", True)
+
+    def seek(self, key):
+        """
+        Return the page starting with key, or with the first record after key if key does not exist.
+
+        """
+        return self.page(key, ">=", False)
+
+    def count(self, below=None):
+        """
+        Return the number of records, or the number of records before key
+        below. This is the position of below in key order, read from the
+        primary key index without reading the records.
+
+        """
+        predicates = []
+        params = []
+        if self.condition is not None:
+            predicates.append(f"({self.condition})")
+            params.extend(self.params)
+        if below is not None:
+            if not isinstance(below, (tuple, list)):
+                below = (below,)
+            placeholders = ", ".join([self.db.placeholder] * len(self.keys))
+            if len(self.keys) == 1:
+                predicates.append(f"{self.keys[0]} < {placeholders}")
+            else:
+                predicates.append(f"({', '.join(self.keys)}) < ({placeholders})")
+            params.extend(below)
+        condition = ""
+        if len(predicates) > 0:
+            condition = " where " + " and ".join(predicates)
+        records = self.db.execute(f"select count(*) from {self.table.name}{condition}", params)
+        return records[0][0] if records else 0
+
+    def page(self, key, operator, descending):
+        """
+        Read one page. Records are always returned in ascending key order.
 
         Parameters
         ----------
-        query_string : str
-            Query to execute
+        key : Variable, tuple or None
+            Key to compare with. None reads from the start (or end when descending) of the table.
+
+        operator : str
+            Comparison operator for the key, one of >, >=, <, <=.
+
+        descending : bool
+            Read in descending key order, used for reading backwards.
 
         Returns
         -------
         List of records : list
-            List of records
+            Records of the page.
 
         """
+        query_string, params = self.statement(key, operator, descending)
+        records = self.db.execute(query_string, params)
+        if records is None:
+            return []
+        if descending:
+            records.reverse()
+        return records
+
+    def statement(self, key, operator, descending, limit=None):
+        """
+        Return the query and its parameters for one page, see page. Records
+        are in descending key order when descending is True.
+        limit replaces page_size if given.
 
-        cur = self.connection.cursor()
-        try:
-            cur.execute(query_string)
-            return cur.fetchall()
-        except:
-            tb.print_exc()
-            print("Cannot execute ", query_string)
-            return None
-
-    def record(self, tablename, pkey_column, pkey_value):
         """
-        Retrieve a record from given tablename, using given primary key column and value.
+        predicates = []
+        params = []
+        if self.condition is not None:
+            predicates.append(f"({self.condition})")
+            params.extend(self.params)
+        if key is not None:
+            if not isinstance(key, (tuple, list)):
+                key = (key,)
+            placeholders = ", ".join([self.db.placeholder] * len(self.keys))
+            if len(self.keys) == 1:
+                predicates.append(f"{self.keys[0]} {operator} {placeholders}")
+            else:
+                predicates.append(f"({', '.join(self.keys)}) {operator} ({placeholders})")
+            params.extend(key)
+        direction = " desc" if descending else ""
+        condition = ""
+        if len(predicates) > 0:
+            condition = "where " + " and ".join(predicates)
+        condition += " order by " + ", ".join(k + direction for k in self.keys)
+        condition += f" limit {int(limit if limit is not None else self.page_size)}"
+        return f"select * from {self.table.name} {condition}", params
+
+
+class PreparedStatementCache:
+    """
+    LRU cache of server side prepared statements of one Postgresql connection.
 
+    A statement written with %s placeholders is prepared once with PREPARE,
+    later calls with the same SQL text run EXECUTE on the prepared plan.
+    When more than size statements are prepared, the least recently used one
+    is released with DEALLOCATE.
 
-            SELECT * FROM tablename WHERE pkey_column = pkey_value
+    Attributes
+    ----------
+    size : int
+        Maximum number of prepared statements kept on the server.
 
+    statements : OrderedDict
+        SQL text to (statement name, number of parameters), least recently used first.
 
-        Parameters
-        ----------
-        tablename : str
-            Name of the table
+    """
 
-        pkey_column : str
-            Name of the primary key column
+    placeholder = re.compile(r"%(%|s)")
 
-        pkey_value : variable
-            Value for the pkey_column
+    def __init__(self, size=64):
+        self.size = size
+        self.statements = OrderedDict()
+        self.counter = 0
+
+    def convert(self, query_string):
+        """
+        Convert %s placeholders to $1, $2, ... as PREPARE expects. Escaped %% becomes %.
 
         Returns
         -------
-        Record : list
-            Returns a row from table.
+        (str, int) : tuple
+            Converted SQL text and the number of parameters.
 
         """
+        count = 0
 
-        if tablename in self.tables.keys():
-            cur = self.connection.cursor()
-            records = self.tables[tablename].query(cur, f" where {pkey_column}={pkey_value}")
-            _record = None
-            if records is not None:
-                _record = records[0]
-            return _record
+        def number(match):
+            nonlocal count
+            if match.group(1) == "%":
+                return "%"
+            count += 1
+            return f"${count}"
 
+        return self.placeholder.sub(number, query_string), count
 
-class DBSQLite(DB):
+    def execute(self, cur, query_string, params):
+        """
+        Execute query_string with params on cur, preparing the statement first if needed.
+
+        """
+        if query_string in self.statements:
+            self.statements.move_to_end(query_string)
+            name, count = self.statements[query_string]
+        else:
+            sql, count = self.convert(query_string)
+            self.counter += 1
+            name = f"dbwidgets_{self.counter}"
+            cur.execute(f"PREPARE {name} AS {sql}")
+            self.statements[query_string] = (name, count)
+            if len(self.statements) > self.size:
+                _, (oldname, _) = self.statements.popitem(last=False)
+                cur.execute(f"DEALLOCATE {oldname}")
+        if count == 0:
+            cur.execute(f"EXECUTE {name}")
+        else:
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * count)})", params)
+
+    def clear(self):
+        """
+        Forget all statements. Used when the connection is replaced, since prepared
+        statements live only as long as their connection.
+
+        """
+        self.statements.clear()
+
+
+class LRUCache:
     """
-    This class represents the SQLite database class.
+    Least recently used cache with a limit on the number of entries and,
+    optionally, on the estimated memory size of the values.
 
     Attributes
     ----------
+    max_entries : int
+        Maximum number of entries.
 
-    filename : str
-        Name of the SQLite database file.
+    max_bytes : int or None
+        Maximum estimated size of all values in bytes. None for no limit.
 
-    connection : Connection handle
-        Connection handle to database.
+    nbytes : int
+        Estimated size of the values in the cache.
 
     """
 
-    def __init__(self, filename):
-        DB.__init__(self, filename=filename)
-        self.connection = sqlite3.connect(self.filename)
+    def __init__(self, max_entries=128, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.nbytes = 0
 
-    def extract(self):
+    @staticmethod
+    def sizeof(value):
         """
-        Extracts table schema from sqlite internal tables: pragma_table_info and pragma_foreign_key_list.
+        Estimate the memory size of a value, a record list is counted with its records and fields.
 
-        Fills self.tables dictionary.
+        """
+        size = sys.getsizeof(value)
+        if isinstance(value, (list, tuple)):
+            for item in value:
+                size += sys.getsizeof(item)
+                if isinstance(item, (list, tuple)):
+                    size += sum(sys.getsizeof(field) for field in item)
+        return size
+
+    def get(self, key, default=None):
+        """
+        Return the value for key and mark it as recently used, default if key is not cached.
 
         """
-        tablenames = self.execute("select name from sqlite_master")
-
-        for table in tablenames:
-            t = Table(table[0])
-            columns = self.execute(f"select * from pragma_table_info('{table[0]}')")
-            fkeys = self.execute(f"SELECT * FROM pragma_foreign_key_list('{table[0]}')")
-            for col in columns:
-                colname = col[1]
-                coltype = col[2]
-                pkey = False
-                if col[5] == 1:
-                    pkey = True
-                t.addColumn(Column(colname, coltype, primary_key=pkey))
-            if fkeys is not None:
-                for fk in fkeys:
-                    tbname = fk[2]
-                    from_col = fk[3]
-                    to_col = fk[4]
-                    t.columns[from_col].addForeignKey(tbname, to_col)
-            self.tables[table[0]] = t
+        if key not in self.entries:
+            return default
+        self.entries.move_to_end(key)
+        return self.entries[key]
 
+    def put(self, key, value):
+        """
+        Store value for key, evicting least recently used entries to stay in the limits.
+        A value larger than max_bytes is not stored.
 
-class DBPostgres(DB):
+        """
+        self.discard(key)
+        size = 0
+        if self.max_bytes is not None:
+            size = self.sizeof(value)
+            if size > self.max_bytes:
+                return
+        self.entries[key] = value
+        self.sizes[key] = size
+        self.nbytes += size
+        while len(self.entries) > self.max_entries or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+            oldkey, _ = self.entries.popitem(last=False)
+            self.nbytes -= self.sizes.pop(oldkey)
+
+    def discard(self, key):
+        """
+        Remove key from the cache if it is there.
+
+        """
+        if key in self.entries:
+            del self.entries[key]
+            self.nbytes -= self.sizes.pop(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.sizes.clear()
+        self.nbytes = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class ConnectionPool:
     """
-    This class represents the Postgresql database class.
+    Thread safe pool of database connections with checkout / checkin semantics.
+
+    At most maxconn connections are checked out at the same time, checkout
+    waits for a connection to be returned when the limit is reached. Checkout
+    is reentrant: a thread that already holds a connection gets the same
+    connection again, and the connection goes back to the pool when the
+    outermost checkin is done.
+
+    Database specific pools implement newConnection, and may override take / give
+    to keep the idle connections somewhere else.
 
     Attributes
     ----------
-    host : str
-        Host name of the server that database is running. Default is None
+    maxconn : int
+        Maximum number of connections checked out at the same time.
 
-    port : int
-        Port number for the database service. Default is None
+    timeout : float or None
+        Seconds to wait for a free connection before raising an exception. None waits forever.
 
-    dbname : str
-        Name of the database
+    """
 
-    tables : dict
-        Dictionary of tables in the database. Key value is table name.
+    def __init__(self, maxconn=4, timeout=None):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.idle = []
+        self.used = 0
+        self.condition = threading.Condition()
+        self.local = threading.local()
 
-    connection : Connection handle
-        Connection handle to database.
+    def newConnection(self):
+        """
+        Open a new connection. Implemented by database specific pools.
 
+        """
+        raise NotImplementedError
 
-    """
+    def take(self):
+        """
+        Return an idle connection, or a new one if there is none. Called with
+        self.condition held, like give, so both see the same self.idle.
 
-    def __init__(self, host=None, port=None, dbname=None, username=None, password=None, filename=None):
-        # TODO: Add support for connecting through unix socket
-        DB.__init__(self, host=host, port=port, dbname=dbname, filename=filename)
+        """
+        if len(self.idle) > 0:
+            return self.idle.pop()
+        return self.newConnection()
 
-        self.connection = None
-        self.connected = False
-        if (username is not None):
-            self.connect(username, password)
-        if self.connected:
-            self.extract()
+    def give(self, conn):
+        """
+        Keep a returned connection as idle.
 
-    def connect(self, user, passwd):
-        conn_str = f"dbname='{self.dbname}' user='{user}' host='{self.host}' password='{passwd}' "
-        try:
-            self.connection = psycopg2.connect(conn_str)
-            if self.connection is not None:
-                self.connected = True
-        except psycopg2.OperationalError:
-            tb.print_exc()
-            self.connected = False
+        """
+        self.idle.append(conn)
 
-    def extract(self):
+    def checkout(self):
         """
-        Extracts table schema from postgresql internal tables.
+        Return a connection for the calling thread. Each checkout must be paired with a checkin.
 
-        Fills self.tables dictionary.
+        """
+        held = getattr(self.local, "connection", None)
+        if held is not None:
+            self.local.depth += 1
+            return held
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.used < self.maxconn, self.timeout):
+                raise Exception(f"No free connection in pool after {self.timeout} seconds, {self.maxconn} in use.")
+            self.used += 1
+            try:
+                conn = self.take()
+            except:
+                self.used -= 1
+                self.condition.notify()
+                raise
+        self.local.connection = conn
+        self.local.depth = 1
+        return conn
+
+    def checkin(self):
+        """
+        Return the connection held by the calling thread to the pool.
 
         """
-        tablenames = self.execute("select table_name from information_schema.tables where table_schema='public'")
-        columns = self.execute(
-            "select table_name, column_name, data_type, column_default from information_schema.columns where table_schema='public'")
-        primary_keys = self.execute("""SELECT 
-                        c.column_name, c.table_name 
-                    FROM 
-                        information_schema.key_column_usage AS c 
-                    LEFT JOIN 
-                        information_schema.table_constraints AS t ON t.constraint_name = c.constraint_name 
-                    WHERE  
-                        t.constraint_type = 'PRIMARY KEY'""")
-        foreign_keys = self.execute("""SELECT
-                    tc.table_name, kcu.column_name,
-                    ccu.table_name AS foreign_table_name,
-                    ccu.column_name AS foreign_column_name
+        conn = getattr(self.local, "connection", None)
+        if conn is None:
+            raise Exception("Connection checkin without checkout.")
+        self.local.depth -= 1
+        if self.local.depth > 0:
+            return
+        self.local.connection = None
+        with self.condition:
+            self.give(conn)
+            self.used -= 1
+            self.condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager doing checkout and checkin around a block.
+
+            with pool.connection() as conn:
+                ...
+
+        """
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.checkin()
+
+    def close(self):
+        """
+        Close the idle connections.
+
+        """
+        with self.condition:
+            for conn in self.idle:
+                conn.close()
+            self.idle = []
+
+
+class SQLitePool(ConnectionPool):
+    """
+    Pool of SQLite connections. A thread gets back the connection it used last
+    time if that connection is idle, so in practice every thread works with its
+    own connection and its own statement cache.
+
+    An in memory database (":memory:") is opened as a named shared cache
+    database, so every connection of the pool sees the same data.
+
+    Attributes
+    ----------
+    filename : str
+        Name of the SQLite database file.
+
+    cached_statements : int
+        Statement cache size of each connection.
+
+    """
+
+    counter = itertools.count(1)
+
+    def __init__(self, filename, maxconn=4, cached_statements=256, timeout=None):
+        ConnectionPool.__init__(self, maxconn, timeout)
+        self.filename = filename
+        self.cached_statements = cached_statements
+        self.uri = False
+        if filename == ":memory:":
+            self.filename = f"file:dbwidgets_memory_{next(self.counter)}?mode=memory&cache=shared"
+            self.uri = True
+
+    def newConnection(self):
+        return sqlite3.connect(self.filename, cached_statements=self.cached_statements,
+                               check_same_thread=False, uri=self.uri)
+
+    def take(self):
+        last = getattr(self.local, "last", None)
+        if last is not None and last in self.idle:
+            self.idle.remove(last)
+            return last
+        conn = ConnectionPool.take(self)
+        self.local.last = conn
+        return conn
+
+
+class PostgresPool(ConnectionPool):
+    """
+    Pool of Postgresql connections kept in a psycopg2 ThreadedConnectionPool.
+    psycopg2 pool keeps minconn idle connections open and closes the rest,
+    this class adds the waiting checkout and per thread reentrancy. The GUI
+    thread holds one connection all the time, so minconn should be maxconn;
+    otherwise the connections of worker threads are closed on every checkin
+    and lose their prepared statements.
+
+    Attributes
+    ----------
+    pgpool : psycopg2.pool.ThreadedConnectionPool
+        Underlying psycopg2 pool.
+
+    """
+
+    def __init__(self, minconn=1, maxconn=4, timeout=None, **connect_args):
+        ConnectionPool.__init__(self, maxconn, timeout)
+        self.pgpool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, **connect_args)
+
+    def take(self):
+        return self.pgpool.getconn()
+
+    def give(self, conn):
+        self.pgpool.putconn(conn)
+
+    def close(self):
+        self.pgpool.closeall()
+
+
+class ChangeEvent:
+    """
+    A row level change reported by a ChangeFeed.
+
+    Attributes
+    ----------
+    table : str
+        Name of the changed table, as in DB.tables.
+
+    op : str
+        INSERT, UPDATE or DELETE.
+
+    key : tuple
+        Primary key values of the changed row.
+
+    """
+
+    def __init__(self, table, op, key):
+        self.table = table
+        self.op = op
+        self.key = tuple(key)
+
+    def __repr__(self):
+        return f"ChangeEvent({self.table}, {self.op}, {self.key})"
+
+
+class ChangeFeed:
+    """
+    Delivers row level changes of watched tables to subscribers. Database
+    specific feeds install the triggers that record the changes and read them in poll.
+
+    Nothing runs in background here, poll is called by the application, for
+    example by the ChangeWatcher of dbwidgets.widgets from the Qt event loop.
+
+    Attributes
+    ----------
+    db : DB
+        Database to watch.
+
+    subscribers : dict
+        Callbacks of each table, table name as key. A callback gets a ChangeEvent.
+
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.subscribers = {}
+        self.watched = set()
+
+    def subscribe(self, tablename, callback):
+        """
+        Call callback with a ChangeEvent for every change of tablename found by poll.
+        Triggers for the table are installed on the first subscription.
+
+        """
+        if tablename not in self.watched:
+            self.watch(tablename)
+            self.watched.add(tablename)
+        self.subscribers.setdefault(tablename, []).append(callback)
+
+    def unsubscribe(self, tablename, callback):
+        """
+        Stop calling callback for changes of tablename.
+
+        """
+        if callback in self.subscribers.get(tablename, []):
+            self.subscribers[tablename].remove(callback)
+
+    def keyColumns(self, tablename):
+        keys = self.db.tables[tablename].primaryKey()
+        if len(keys) == 0:
+            raise Exception(f"Table {tablename} has no primary key, changes cannot be reported by row.")
+        return keys
+
+    def watch(self, tablename):
+        """
+        Install the triggers recording changes of tablename. Implemented by database specific feeds.
+
+        """
+        raise NotImplementedError
+
+    def read(self):
+        """
+        Return the ChangeEvents recorded since the last read. Implemented by database specific feeds.
+
+        """
+        raise NotImplementedError
+
+    def fileno(self):
+        """
+        Socket that becomes readable when changes arrive, None if the feed must be polled on a timer.
+
+        """
+        return None
+
+    def poll(self):
+        """
+        Read the new changes, report them with DB.notifyWrite so caches are
+        dropped, and pass them to the subscribers.
+
+        Returns
+        -------
+        List of events : list
+            ChangeEvents read.
+
+        """
+        events = self.read()
+        for tablename in set(event.table for event in events):
+            self.db.notifyWrite(tablename)
+        for event in events:
+            for callback in list(self.subscribers.get(event.table, [])):
+                callback(event)
+        return events
+
+
+class SQLiteChangeFeed(ChangeFeed):
+    """
+    Change feed for SQLite. Triggers on the watched tables append the
+    primary key of every inserted, updated or deleted row to the
+    dbwidgets_changelog table, poll reads the rows added since the last poll.
+    Changes made by other connections and other processes are seen as well.
+
+    Attributes
+    ----------
+    last_seq : int
+        Sequence number of the last change read.
+
+    keep : int
+        Number of change log rows kept, older rows are deleted by poll.
+
+    """
+
+    def __init__(self, db, keep=10000):
+        ChangeFeed.__init__(self, db)
+        self.keep = keep
+        with db.transaction() as cur:
+            cur.execute("""CREATE TABLE IF NOT EXISTS dbwidgets_changelog (
+                                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                                tablename TEXT NOT NULL,
+                                op TEXT NOT NULL,
+                                rowkey TEXT NOT NULL)""")
+        self.last_seq = db.execute("select coalesce(max(seq), 0) from dbwidgets_changelog")[0][0]
+
+    def watch(self, tablename):
+        keys = self.keyColumns(tablename)
+        name = tablename.replace(".", "_")
+        new = "json_array(" + ", ".join(f"NEW.{k}" for k in keys) + ")"
+        old = "json_array(" + ", ".join(f"OLD.{k}" for k in keys) + ")"
+        key_changed = " OR ".join(f"OLD.{k} IS NOT NEW.{k}" for k in keys)
+        log = "INSERT INTO dbwidgets_changelog (tablename, op, rowkey) VALUES"
+        with self.db.transaction() as cur:
+            cur.execute(f"""CREATE TRIGGER IF NOT EXISTS dbwidgets_{name}_insert AFTER INSERT ON {tablename}
+                            BEGIN {log} ('{tablename}', 'INSERT', {new}); END""")
+            cur.execute(f"""CREATE TRIGGER IF NOT EXISTS dbwidgets_{name}_update AFTER UPDATE ON {tablename}
+                            WHEN NOT ({key_changed})
+                            BEGIN {log} ('{tablename}', 'UPDATE', {new}); END""")
+            # a changed primary key is reported as a delete of the old row and an insert of the new one
+            cur.execute(f"""CREATE TRIGGER IF NOT EXISTS dbwidgets_{name}_rekey AFTER UPDATE ON {tablename}
+                            WHEN ({key_changed})
+                            BEGIN {log} ('{tablename}', 'DELETE', {old}); {log} ('{tablename}', 'INSERT', {new}); END""")
+            cur.execute(f"""CREATE TRIGGER IF NOT EXISTS dbwidgets_{name}_delete AFTER DELETE ON {tablename}
+                            BEGIN {log} ('{tablename}', 'DELETE', {old}); END""")
+
+    def read(self):
+        records = self.db.execute("select seq, tablename, op, rowkey from dbwidgets_changelog where seq > ? order by seq",
+                                  (self.last_seq,))
+        if records is None or len(records) == 0:
+            return []
+        self.last_seq = records[-1][0]
+        if self.last_seq % 1000 < len(records):
+            self.prune()
+        return [ChangeEvent(tablename, op, json.loads(rowkey)) for _, tablename, op, rowkey in records]
+
+    def prune(self):
+        """
+        Delete change log rows older than the last keep rows.
+
+        """
+        with self.db.transaction() as cur:
+            cur.execute("delete from dbwidgets_changelog where seq <= ?", (self.last_seq - self.keep,))
+
+
+class PostgresChangeFeed(ChangeFeed):
+    """
+    Change feed for Postgresql using LISTEN / NOTIFY. A trigger function sends
+    the table and primary key of every changed row to the dbwidgets_changes
+    channel. The feed listens on its own autocommit connection, whose socket
+    becomes readable when a notification arrives.
+
+    Attributes
+    ----------
+    listener : connection
+        Connection listening on the channel.
+
+    """
+
+    channel = "dbwidgets_changes"
+
+    def __init__(self, db, **connect_args):
+        ChangeFeed.__init__(self, db)
+        self.listener = psycopg2.connect(**connect_args)
+        self.listener.autocommit = True
+        self.listener.cursor().execute(f"LISTEN {self.channel}")
+        with db.transaction() as cur:
+            cur.execute(f"""CREATE OR REPLACE FUNCTION dbwidgets_notify() RETURNS trigger AS $$
+                DECLARE
+                    newkey jsonb := '[]'::jsonb;
+                    oldkey jsonb := '[]'::jsonb;
+                    col text;
+                BEGIN
+                    FOREACH col IN ARRAY TG_ARGV LOOP
+                        IF TG_OP <> 'DELETE' THEN newkey := newkey || jsonb_build_array(to_jsonb(NEW) -> col); END IF;
+                        IF TG_OP <> 'INSERT' THEN oldkey := oldkey || jsonb_build_array(to_jsonb(OLD) -> col); END IF;
+                    END LOOP;
+                    PERFORM pg_notify('{self.channel}', json_build_object(
+                        'schema', TG_TABLE_SCHEMA, 'table', TG_TABLE_NAME, 'op', TG_OP,
+                        'key', newkey, 'oldkey', oldkey)::text);
+                    RETURN NULL;
+                END
+                $$ LANGUAGE plpgsql""")
+
+    def watch(self, tablename):
+        keys = ", ".join(f"'{k}'" for k in self.keyColumns(tablename))
+        trigger = "dbwidgets_" + tablename.replace(".", "_")
+        with self.db.transaction() as cur:
+            # CREATE TRIGGER locks the table against every reader, skip it when
+            # another window or program has installed the trigger already
+            cur.execute("SELECT 1 FROM pg_trigger WHERE tgrelid = %s::regclass AND tgname = %s",
+                        (tablename, trigger))
+            if cur.fetchone() is None:
+                cur.execute(f"""CREATE TRIGGER {trigger} AFTER INSERT OR UPDATE OR DELETE ON {tablename}
+                                FOR EACH ROW EXECUTE PROCEDURE dbwidgets_notify({keys})""")
+
+    def fileno(self):
+        return self.listener.fileno()
+
+    def read(self):
+        self.listener.poll()
+        events = []
+        while self.listener.notifies:
+            payload = json.loads(self.listener.notifies.pop(0).payload)
+            tablename = self.db.tableName(payload["schema"], payload["table"])
+            op, key, oldkey = payload["op"], payload["key"], payload["oldkey"]
+            if op == "DELETE":
+                events.append(ChangeEvent(tablename, op, oldkey))
+            elif op == "UPDATE" and key != oldkey:
+                # a changed primary key is reported as a delete of the old row and an insert of the new one
+                events.append(ChangeEvent(tablename, "DELETE", oldkey))
+                events.append(ChangeEvent(tablename, "INSERT", key))
+            else:
+                events.append(ChangeEvent(tablename, op, key))
+        return events
+
+    def close(self):
+        self.listener.close()
+
+
+class EditBuffer:
+    """
+    Keeps the edits of a table's rows until they are written with flush.
+
+    Edits are kept by primary key with the record as it was read before the
+    first edit. flush writes all of them in one transaction. Rows that
+    changed the same columns are written together with executemany, as one
+    UPDATE statement per set of changed columns.
+
+    Before writing, the edited rows are read again in the same transaction.
+    A row is a conflict if another user changed an edited column since it was
+    read, or deleted the row. Conflicting rows are not written and their
+    edits are dropped, so a later flush does not overwrite the other change.
+    The dropped edits are kept in rejected, reapply makes them pending again
+    against the current record.
+
+    Attributes
+    ----------
+    db : DB
+        Database to write to.
+
+    table : Table
+        Edited table.
+
+    keys : list
+        Primary key column names.
+
+    pending : dict
+        New column values of each edited row, {key: {column: value}}.
+
+    originals : dict
+        Records of edited rows as read before the first edit.
+
+    rejected : dict
+        Edits of the conflicting rows of the last flush with the current
+        record, {key: (record, {column: value})}.
+
+    """
+
+    def __init__(self, db, tablename):
+        self.db = db
+        self.table = db.tables[tablename]
+        self.keys = self.table.primaryKey()
+        if len(self.keys) == 0:
+            raise Exception(f"Table {tablename} has no primary key, edits cannot be written back.")
+        self.columns = list(self.table.columns.keys())
+        self.pending = {}
+        self.originals = {}
+        self.rejected = {}
+
+    def set(self, key, record, column, value):
+        """
+        Record value as the new value of column in the row with primary key key.
+        record is the row as read from the database. Setting the original value back removes the edit.
+
+        """
+        key = tuple(key)
+        original = self.originals.setdefault(key, tuple(record))
+        changes = self.pending.setdefault(key, {})
+        if original[self.columns.index(column)] == value:
+            changes.pop(column, None)
+        else:
+            changes[column] = value
+        if len(changes) == 0:
+            self.discard(key)
+
+    def isDirty(self, key=None):
+        """
+        True if there are pending edits, of the given row if key is given.
+
+        """
+        if key is None:
+            return len(self.pending) > 0
+        return tuple(key) in self.pending
+
+    def discard(self, key=None):
+        """
+        Forget the pending edits of one row, or of all rows and the rejected
+        edits if key is None.
+
+        """
+        if key is None:
+            self.pending = {}
+            self.originals = {}
+            self.rejected = {}
+        else:
+            self.pending.pop(tuple(key), None)
+            self.originals.pop(tuple(key), None)
+
+    def reapply(self, key):
+        """
+        Make the edits of a conflicting row pending again, against the record
+        read by the flush that rejected them. The next flush writes them unless
+        the row changed again.
+
+        Returns
+        -------
+        Changes : dict
+            Reapplied column values, empty if there were no rejected edits for key.
+
+        """
+        record, changes = self.rejected.pop(tuple(key), (None, {}))
+        for column, value in changes.items():
+            self.set(key, record, column, value)
+        return changes
+
+    def keyCondition(self):
+        return " and ".join(f"{k} = {self.db.placeholder}" for k in self.keys)
+
+    def current(self, cur, keys, chunk_size=500):
+        # read the edited rows again, inside the writing transaction
+        records = {}
+        keyindex = [self.columns.index(k) for k in self.keys]
+        lock = " for update" if self.db.placeholder == "%s" else ""
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            condition = " or ".join(f"({self.keyCondition()})" for _ in chunk)
+            params = [v for key in chunk for v in key]
+            query_string = f"select * from {self.table.name} where {condition}{lock}"
+            with self.db.instrument(query_string, params) as event:
+                self.db.run_statement(cur, query_string, params)
+                event.executed()
+                fetched = cur.fetchall()
+                event.fetched(len(fetched))
+            for record in fetched:
+                records[tuple(record[j] for j in keyindex)] = tuple(record)
+        return records
+
+    def flush(self):
+        """
+        Write the pending edits in one transaction.
+
+        Returns
+        -------
+        written : dict
+            Written rows as they are now in the database, by key.
+
+        conflicts : dict
+            Current records of conflicting rows by key, None for deleted rows.
+            Their edits are moved to rejected.
+
+        """
+        written = {}
+        conflicts = {}
+        if len(self.pending) == 0:
+            return written, conflicts
+        groups = {}
+        with self.db.transaction() as cur:
+            current = self.current(cur, list(self.pending.keys()))
+            for key, changes in self.pending.items():
+                record = current.get(key)
+                original = self.originals[key]
+                if record is None or any(record[self.columns.index(c)] != original[self.columns.index(c)] for c in changes):
+                    conflicts[key] = record
+                    continue
+                columns = tuple(sorted(changes))
+                groups.setdefault(columns, []).append([changes[c] for c in columns] + list(key))
+                written[key] = tuple(changes.get(c, record[i]) for i, c in enumerate(self.columns))
+            for columns, rows in groups.items():
+                assignments = ", ".join(f"{c} = {self.db.placeholder}" for c in columns)
+                query_string = f"update {self.table.name} set {assignments} where {self.keyCondition()}"
+                with self.db.instrument(query_string) as event:
+                    cur.executemany(query_string, [self.db.adapt(row) for row in rows])
+                    event.executed()
+                    event.rows = len(rows)
+        for key in written:
+            self.discard(key)
+        for key, record in conflicts.items():
+            if record is not None:
+                self.rejected[key] = (record, self.pending[key])
+            self.discard(key)
+        if len(written) > 0:
+            self.db.notifyWrite(self.table.name)
+        return written, conflicts
+
+
+class QueryEvent:
+    """
+    Timing of one statement, passed to the hooks of DB.addHook.
+
+    Attributes
+    ----------
+    query : str
+        Statement text.
+
+    params : sequence or None
+        Values for the placeholders.
+
+    source : str or None
+        Widget that issued the statement, see DB.source.
+
+    exec_time : float
+        Seconds spent executing the statement.
+
+    fetch_time : float
+        Seconds spent fetching the rows.
+
+    rows : int
+        Number of rows fetched, or written for data changes.
+
+    error : str or None
+        Error message if the statement failed.
+
+    """
+
+    def __init__(self, query, params, source):
+        self.query = query
+        self.params = params
+        self.source = source
+        self.exec_time = 0.0
+        self.fetch_time = 0.0
+        self.rows = 0
+        self.error = None
+        self.started = time.perf_counter()
+        self.last = self.started
+
+    def mark(self):
+        """
+        Start timing the next fetch, for results fetched a block at a time.
+
+        """
+        self.last = time.perf_counter()
+
+    def executed(self):
+        """
+        Record the execution time, the time since the event was created.
+
+        """
+        self.last = time.perf_counter()
+        self.exec_time = self.last - self.started
+
+    def fetched(self, rows):
+        """
+        Add rows and the time since executed or mark to the fetch time.
+
+        """
+        now = time.perf_counter()
+        self.fetch_time += now - self.last
+        self.last = now
+        self.rows += rows
+
+    def asDict(self):
+        return {"query": self.query, "source": self.source, "exec_time": self.exec_time,
+                "fetch_time": self.fetch_time, "rows": self.rows, "error": self.error}
+
+
+class DB:
+    """
+    This class represents the base Database class. New classes for
+    individual databases like sqlite or postgresql inherits this class.
+
+
+    Attributes
+    ----------
+    host : str
+        Host name of the server that database is running. None for SQLite. Default is None
+
+    port : int
+        Port number for the database service. None for SQLite. Default is None
+
+    dbname : str
+        Name of the database
+
+    tables : dict
+        Dictionary of tables in the database. Key value is table name.
+
+    connection : Connection handle
+        Connection handle of the thread that created the database object,
+        normally the GUI thread. It stays checked out from the pool.
+
+    pool : ConnectionPool
+        Pool of connections. Other threads use connections from the pool with pooled().
+
+    filename : str
+        Name of the database file. Valid for SQLite. Default is None
+
+    placeholder : str
+        Parameter placeholder of the database driver, "?" for SQLite, "%s" for Postgresql.
+
+    lookups : LRUCache
+        (id, text) records of lookup tables, see lookup.
+
+    record_cache : LRUCache
+        Records read by record, by (table, column, value).
+
+    """
+
+    placeholder = "?"
+    schema_cache_version = 1
+
+    def __init__(self, host=None, port=None, dbname=None, filename=None):
+        self.host = host
+        self.port = port
+        self.dbname = dbname
+        self.tables = {}
+        self.connection = None
+        self.pool = None
+        self.filename = filename
+        self.table_versions = {}
+        self.feed = None
+        self.lookups = LRUCache(64)
+        self.lookup_versions = {}
+        self.record_cache = LRUCache(4096)
+        self.cache_lock = threading.Lock()
+        self.transactions = threading.local()
+        self.before_hooks = []
+        self.after_hooks = []
+        self.slow_query_time = None
+        self.sources = threading.local()
+        self.stats_lock = threading.Lock()
+        self.resetStats()
+
+    def setPool(self, pool):
+        """
+        Use pool for the connections. self.connection is checked out for the calling thread
+        and kept, other threads check out their own connections.
+
+        """
+        self.pool = pool
+        self.connection = self.pool.checkout()
+
+    def pooled(self):
+        """
+        Context manager giving a connection for the calling thread from the pool.
+        On the thread that created the database object this is self.connection.
+
+            with db.pooled() as conn:
+                cur = conn.cursor()
+
+        """
+        return self.pool.connection()
+
+    def begin(self, conn):
+        """
+        Start a transaction on conn. psycopg2 starts transactions by itself,
+        database classes override this when the driver does not.
+
+        """
+        pass
+
+    def inTransaction(self):
+        """
+        Return True if the calling thread is in a transaction block.
+
+        """
+        return getattr(self.transactions, "depth", 0) > 0
+
+    def endRead(self, conn):
+        """
+        End the transaction the driver started on conn for a read outside
+        transaction(), so the connection does not keep its locks. Database
+        classes override this when the driver opens transactions for reads.
+
+        """
+        pass
+
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager running a block in one transaction on the calling thread's
+        connection. Commits at the end of the block, rolls back if it raises.
+
+            with db.transaction() as cur:
+                cur.execute(...)
+
+        """
+        with self.pooled() as conn:
+            self.begin(conn)
+            cur = conn.cursor()
+            self.transactions.depth = getattr(self.transactions, "depth", 0) + 1
+            try:
+                yield cur
+            except:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+            finally:
+                self.transactions.depth -= 1
+                cur.close()
+
+    def _bulkInsert(self, tablename, columns, rows, batch_size=1000, progress=None):
+        """
+        Insert rows into columns of tablename in one transaction, batch_size
+        rows per executemany call. Internal, applications call Table.bulkInsert,
+        which checks the rows first.
+
+        Returns
+        -------
+        Number of rows : int
+            Number of rows inserted.
+
+        """
+        query_string = (f"insert into {tablename} ({', '.join(columns)}) "
+                        f"values ({', '.join([self.placeholder] * len(columns))})")
+        count = 0
+        rows = iter(rows)
+        with self.transaction() as cur:
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if len(batch) == 0:
+                    break
+                with self.instrument(query_string) as event:
+                    cur.executemany(query_string, [self.adapt(row) for row in batch])
+                    event.executed()
+                    event.rows = len(batch)
+                count += len(batch)
+                if progress is not None:
+                    progress(count)
+        self.notifyWrite(tablename)
+        return count
+
+    def changeFeed(self):
+        """
+        Return the ChangeFeed of the database, created on the first call.
+        Implemented by database classes.
+
+        """
+        raise NotImplementedError
+
+    def notifyWrite(self, tablename):
+        """
+        Tell the database object that the rows of tablename are changed. Caches
+        holding rows of that table see a new tableVersion and drop their contents.
+        Applications writing to the database call this after committing.
+
+        """
+        self.table_versions[tablename] = self.table_versions.get(tablename, 0) + 1
+
+    def tableVersion(self, tablename):
+        """
+        Return a number that changes after each notifyWrite for tablename.
+
+        """
+        return self.table_versions.get(tablename, 0)
+
+    def cacheVersion(self, tablename):
+        """
+        Return the version of tablename for cached data. Cached data of an older version is stale.
+
+        """
+        return (self.dataVersion(), self.tableVersion(tablename))
+
+    def setLookupCache(self, max_entries=64, max_bytes=None, max_records=4096):
+        """
+        Replace the lookup and record caches with empty ones of the given sizes.
+
+        Parameters
+        ----------
+        max_entries : int
+            Number of (table, key column, display column) lookups kept.
+
+        max_bytes : int or None
+            Memory limit of the lookups in bytes, least recently used lookups are dropped first.
+
+        max_records : int
+            Number of records of record kept.
+
+        """
+        with self.cache_lock:
+            self.lookups = LRUCache(max_entries, max_bytes)
+            self.lookup_versions = {}
+            self.record_cache = LRUCache(max_records)
+
+    def cachedLookup(self, tablename, keycolumn, displaycolumn):
+        """
+        Return the cached records of a lookup, None if they are not cached or stale. See lookup.
+
+        """
+        key = (tablename, keycolumn, displaycolumn)
+        version = self.cacheVersion(tablename)
+        with self.cache_lock:
+            if self.lookup_versions.get(key) != version:
+                self.lookups.discard(key)
+                return None
+            return self.lookups.get(key)
+
+    def storeLookup(self, tablename, keycolumn, displaycolumn, records, version):
+        """
+        Cache the records of a lookup, read when the table was at version, see cacheVersion.
+
+        """
+        if records is None:
+            return
+        key = (tablename, keycolumn, displaycolumn)
+        with self.cache_lock:
+            self.lookups.put(key, records)
+            self.lookup_versions[key] = version
+
+    def lookup(self, tablename, keycolumn, displaycolumn):
+        """
+        Return the (key, display) records of a table, as read by
+
+            SELECT keycolumn, displaycolumn FROM tablename
+
+        The records are read once and shared by every caller until the table
+        changes, see notifyWrite and dataVersion, so widgets showing the same
+        lookup table do not each query it. The list must not be modified.
+
+        """
+        records = self.cachedLookup(tablename, keycolumn, displaycolumn)
+        if records is not None:
+            return records
+        version = self.cacheVersion(tablename)
+        records = self.execute(f"select {keycolumn}, {displaycolumn} from {tablename}")
+        self.storeLookup(tablename, keycolumn, displaycolumn, records, version)
+        return records
+
+    def dataVersion(self):
+        """
+        Return a value that changes when another connection commits a change to
+        the database, None if the database cannot tell. Implemented by database classes.
+
+        """
+        return None
+
+    def interrupt(self, conn):
+        """
+        Ask the database to abort the statement running on conn, called from
+        another thread to cancel a stale background query. Implemented by database classes.
+
+        """
+        pass
+
+    def close(self):
+        """
+        Return self.connection and close the connections of the pool.
+
+        """
+        if self.feed is not None and hasattr(self.feed, "close"):
+            self.feed.close()
+            self.feed = None
+        if self.pool is not None:
+            if self.connection is not None:
+                self.pool.checkin()
+                self.connection = None
+            self.pool.close()
+
+    def extract(self, cache_file=None, lazy=False):
+        """
+        Extracts table schema from the database and fills self.tables dictionary.
+
+        If cache_file is given, the schema is saved to that file together with
+        the fingerprint of the database schema. Next time, if the fingerprint
+        has not changed, tables are loaded from the file and the database
+        catalog is not queried.
+
+        If lazy is True, only the table names are read here. self.tables becomes
+        a LazyTables mapping, and the columns of a table are read when the table
+        is accessed for the first time. A lazy extract does not write the cache file,
+        since the schema is not complete yet.
+
+        Parameters
+        ----------
+        cache_file : str or None
+            Path of the schema cache file.
+
+        lazy : bool
+            Read the schema of each table on first access.
+
+        """
+        fingerprint = None
+        if cache_file is not None:
+            fingerprint = self.fingerprint()
+            if self.loadSchema(cache_file, fingerprint):
+                return
+        if lazy:
+            self.tables = LazyTables(self.introspectTable, self.tableNames())
+            return
+        self.introspect()
+        if fingerprint is not None:
+            self.saveSchema(cache_file, fingerprint)
+
+    def introspect(self):
+        """
+        Read the schema of all tables from the database catalog and fill self.tables.
+        Database classes with a faster bulk query override this method.
+
+        """
+        self.tables = {}
+        for name in self.tableNames():
+            self.tables[name] = self.introspectTable(name)
+
+    def tableNames(self):
+        """
+        Return the names of the tables in the database. Implemented by database classes.
+
+        """
+        raise NotImplementedError
+
+    def introspectTable(self, tablename):
+        """
+        Read the schema of one table from the database catalog and return the Table object.
+        Implemented by database classes.
+
+        """
+        raise NotImplementedError
+
+    def fingerprint(self):
+        """
+        Return a string that changes whenever the database schema changes.
+        Implemented by database classes.
+
+        """
+        raise NotImplementedError
+
+    def loadSchema(self, cache_file, fingerprint):
+        """
+        Fill self.tables from cache_file if it was saved for the given fingerprint.
+
+        Returns
+        -------
+        bool : bool
+            True if the tables are loaded, False if the file is missing, unreadable or stale.
+
+        """
+        try:
+            with open(cache_file, "r", encoding="utf-8") as fh:
+                cache = json.load(fh)
+        except (OSError, ValueError):
+            return False
+        if cache.get("version") != self.schema_cache_version or cache.get("fingerprint") != fingerprint:
+            return False
+        tables = {}
+        for values in cache["tables"]:
+            t = Table.fromDict(values, self)
+            tables[t.name] = t
+        self.tables = tables
+        return True
+
+    def saveSchema(self, cache_file, fingerprint):
+        """
+        Save self.tables to cache_file with the given fingerprint. The file is
+        written next to the target and renamed, so readers never see a partial file.
+
+        """
+        cache = {"version": self.schema_cache_version,
+                 "fingerprint": fingerprint,
+                 "tables": [t.asDict() for t in self.tables.values()]}
+        tmpname = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmpname, "w", encoding="utf-8") as fh:
+                json.dump(cache, fh)
+            os.replace(tmpname, cache_file)
+        except OSError:
+            tb.print_exc()
+            print("Cannot write schema cache ", cache_file)
+
+    def report(self):
+        """
+        Print the extracted database schema to standart output
+
+        """
+        print(f"DATABASE {self.dbname} ")
+        for tb in self.tables.values():
+            tb.tbprint()
+
+    def addHook(self, before=None, after=None):
+        """
+        Call before with a QueryEvent when a statement starts, and after when
+        it has finished and its rows are fetched. Hooks run on the thread of the statement.
+
+        """
+        if before is not None:
+            self.before_hooks.append(before)
+        if after is not None:
+            self.after_hooks.append(after)
+
+    def removeHook(self, before=None, after=None):
+        if before in self.before_hooks:
+            self.before_hooks.remove(before)
+        if after in self.after_hooks:
+            self.after_hooks.remove(after)
+
+    def setSlowQueryLog(self, milliseconds):
+        """
+        Log statements slower than milliseconds, execution and fetch together,
+        as warnings of the dbwidgets logger. None turns the log off.
+
+        """
+        self.slow_query_time = None if milliseconds is None else milliseconds / 1000.0
+
+    @staticmethod
+    def sourceName(widget):
+        """
+        Name of widget in the statistics, its class and table, like DBComboBox(cities).
+
+        """
+        if widget is None or isinstance(widget, str):
+            return widget
+        table = getattr(widget, "table", None)
+        return type(widget).__name__ + (f"({table})" if isinstance(table, str) else "")
+
+    @contextmanager
+    def source(self, widget):
+        """
+        Context manager attributing the statements run by the calling thread in
+        the block to widget. widget can also be a name from sourceName.
+
+        """
+        previous = getattr(self.sources, "name", None)
+        self.sources.name = self.sourceName(widget)
+        try:
+            yield
+        finally:
+            self.sources.name = previous
+
+    @contextmanager
+    def instrument(self, query_string, params=None):
+        """
+        Context manager timing one statement. The block calls executed on the
+        yielded QueryEvent after running the statement and fetched after reading
+        rows. Hooks, statistics and the slow query log are updated at the end.
+
+        """
+        event = QueryEvent(query_string, params, getattr(self.sources, "name", None))
+        for hook in self.before_hooks:
+            try:
+                hook(event)
+            except:
+                tb.print_exc()
+        try:
+            yield event
+        except Exception as e:
+            event.error = str(e) or type(e).__name__
+            raise
+        finally:
+            if event.exec_time == 0.0:
+                event.executed()
+            self.record_event(event)
+            for hook in self.after_hooks:
+                try:
+                    hook(event)
+                except:
+                    tb.print_exc()
+
+    def record_event(self, event):
+        total = event.exec_time + event.fetch_time
+        with self.stats_lock:
+            for group, key in (("statements", event.query), ("sources", event.source or "")):
+                entry = self.statistics[group].setdefault(key, {"count": 0, "errors": 0, "exec_time": 0.0,
+                                                                "fetch_time": 0.0, "max_time": 0.0, "rows": 0})
+                entry["count"] += 1
+                entry["errors"] += event.error is not None
+                entry["exec_time"] += event.exec_time
+                entry["fetch_time"] += event.fetch_time
+                entry["max_time"] = max(entry["max_time"], total)
+                entry["rows"] += event.rows
+            if self.slow_query_time is not None and total >= self.slow_query_time:
+                self.slow_queries.append(event.asDict())
+        if self.slow_query_time is not None and total >= self.slow_query_time:
+            logger.warning("slow query %.1f ms (execute %.1f ms, fetch %.1f ms, %d rows) from %s: %s",
+                           total * 1000, event.exec_time * 1000, event.fetch_time * 1000, event.rows,
+                           event.source, event.query)
+
+    def stats(self):
+        """
+        Return a snapshot of the statement statistics since the last resetStats,
+        plain values that can be written as JSON.
+
+        Returns
+        -------
+        Statistics : dict
+            Totals, and the same figures by statement text under "statements" and
+            by widget under "sources". "slow" lists the latest slow statements.
+
+        """
+        with self.stats_lock:
+            statements = {key: dict(value) for key, value in self.statistics["statements"].items()}
+            sources = {key: dict(value) for key, value in self.statistics["sources"].items()}
+            slow = list(self.slow_queries)
+        totals = {name: sum(entry[name] for entry in statements.values())
+                  for name in ("count", "errors", "exec_time", "fetch_time", "rows")}
+        totals.update({"statements": statements, "sources": sources, "slow": slow})
+        return totals
+
+    def resetStats(self):
+        """
+        Clear the statement statistics.
+
+        """
+        with self.stats_lock:
+            self.statistics = {"statements": {}, "sources": {}}
+            self.slow_queries = deque(maxlen=100)
+
+    def run_statement(self, cur, query_string, params=None):
+        """
+        Run query_string on cur. Values in params are bound to the placeholders
+        of query_string by the driver, they are never pasted into the SQL text,
+        so the same statement can be reused with different values.
+
+        Database classes override this method to use their statement caches.
+
+        Parameters
+        ----------
+        cur : database cursor
+            Cursor to execute the query
+
+        query_string : str
+            Query to execute
+
+        params : sequence or None
+            Values for the placeholders in query_string.
+
+        """
+        if params is not None:
+            cur.execute(query_string, self.adapt(params))
+        else:
+            cur.execute(query_string)
+
+    def adapt(self, values):
+        """
+        Return the sequence values with the values the driver cannot bind
+        converted. Database classes override this when their driver lacks a type.
+
+        """
+        return values
+
+    def execute(self, query_string, params=None):
+        """
+        Execute a query given by query_string, using the cursor provided.
+
+        Parameters
+        ----------
+        query_string : str
+            Query to execute. Use self.placeholder for the values given in params.
+
+        params : sequence or None
+            Values for the placeholders in query_string.
+
+        Returns
+        -------
+        List of records : list
+            List of records
+
+        """
+
+        with self.pooled() as conn:
+            cur = conn.cursor()
+            try:
+                with self.instrument(query_string, params) as event:
+                    self.run_statement(cur, query_string, params)
+                    event.executed()
+                    records = cur.fetchall()
+                    event.fetched(len(records))
+                self.endRead(conn)
+                return records
+            except:
+                tb.print_exc()
+                print("Cannot execute ", query_string)
+                # an aborted transaction would make every later statement of the connection fail
+                self.endRead(conn)
+                return None
+
+    def execute_one(self, query_string, params=None, failed=None):
+        """
+        Execute query_string and return its first record only, None if there is
+        none. Reads one row with fetchone instead of fetching the whole result.
+        Returns failed if the query fails, so callers can tell a failure from a missing row.
+
+        """
+        with self.pooled() as conn:
+            cur = conn.cursor()
+            try:
+                with self.instrument(query_string, params) as event:
+                    self.run_statement(cur, query_string, params)
+                    event.executed()
+                    record = cur.fetchone()
+                    event.fetched(0 if record is None else 1)
+                self.endRead(conn)
+                return record
+            except:
+                tb.print_exc()
+                print("Cannot execute ", query_string)
+                # an aborted transaction would make every later statement of the connection fail
+                self.endRead(conn)
+                return failed
+            finally:
+                cur.close()
+
+    def streamCursor(self, conn, query_string=None, params=None, block_size=1000):
+        """
+        Return a cursor of conn for reading a large result in blocks. If
+        query_string is given it is executed. Database classes override this
+        to keep the result on the server.
+
+        """
+        cur = conn.cursor()
+        if query_string is not None:
+            self.run_statement(cur, query_string, params)
+        return cur
+
+    def streamBlocks(self, query_string, params=None, block_size=1000):
+        """
+        Generator running query_string and yielding its records in lists of
+        block_size, see fetchBlocks. Only one block is in memory at a time. A
+        pooled connection is held until the generator is exhausted or closed.
+
+        Parameters
+        ----------
+        query_string : str
+            Query to execute. Use self.placeholder for the values given in params.
+
+        params : sequence or None
+            Values for the placeholders in query_string.
+
+        block_size : int
+            Number of records read with each fetchmany.
+
+        """
+        with self.pooled() as conn:
+            with self.instrument(query_string, params) as event:
+                try:
+                    cur = self.streamCursor(conn, query_string, params, block_size)
+                    event.executed()
+                except:
+                    tb.print_exc()
+                    print("Cannot execute ", query_string)
+                    event.error = "failed"
+                    self.endRead(conn)
+                    return
+                try:
+                    for records in fetchBlocks(cur, block_size):
+                        # fetch time only, not the time the caller spends on the rows
+                        event.fetched(len(records))
+                        yield records
+                        event.mark()
+                finally:
+                    cur.close()
+                    self.endRead(conn)
+
+    def stream(self, query_string, params=None, block_size=1000):
+        """
+        Generator variant of execute, yields the records one by one. Records
+        are read block_size at a time, see streamBlocks.
+
+            for record in db.stream("select * from district"):
+                ...
+
+        """
+        for records in self.streamBlocks(query_string, params, block_size):
+            yield from records
+
+    def open_cursor(self, query_string, params=None):
+        """
+        Execute a query given by query_string and return the cursor without
+        fetching any rows. Caller reads the rows with fetchone / fetchmany
+        and closes the cursor when done. The cursor belongs to self.connection,
+        so it is meant to be used from the thread that created the database object.
+
+        Parameters
+        ----------
+        query_string : str
+            Query to execute
+
+        params : sequence or None
+            Values for the placeholders in query_string.
+
+        Returns
+        -------
+        cursor : database cursor
+            Cursor positioned before the first row, None if the query fails.
+
+        """
+
+        cur = self.connection.cursor()
+        try:
+            with self.instrument(query_string, params):
+                self.run_statement(cur, query_string, params)
+            # the rows are on the client already, the transaction is not needed to read them
+            self.endRead(self.connection)
+            return cur
+        except:
+            tb.print_exc()
+            print("Cannot execute ", query_string)
+            self.endRead(self.connection)
+            return None
+
+    def record(self, tablename, pkey_column, pkey_value):
+        """
+        Retrieve a record from given tablename, using given primary key column and value.
+
+
+            SELECT * FROM tablename WHERE pkey_column = ?
+
+
+        Parameters
+        ----------
+        tablename : str
+            Name of the table
+
+        pkey_column : str
+            Name of the primary key column
+
+        pkey_value : variable
+            Value for the pkey_column
+
+        Returns
+        -------
+        Record : list
+            Returns a row from table.
+
+        Records are cached until the table changes, see lookup.
+
+        """
+
+        if tablename in self.tables.keys():
+            key = (tablename, pkey_column, pkey_value)
+            version = self.cacheVersion(tablename)
+            with self.cache_lock:
+                cached = self.record_cache.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            failed = object()
+            _record = self.execute_one(f"select * from {tablename} where {pkey_column} = {self.placeholder}",
+                                       (pkey_value,), failed)
+            if _record is failed:
+                # do not keep a failure, like a locked database, as a missing row
+                return None
+            with self.cache_lock:
+                self.record_cache.put(key, (version, _record))
+            return _record
+
+    def keyCondition(self, column, values):
+        """
+        Return a predicate matching column with any of values, and its parameters.
+
+            column IN (?, ?, ...)
+
+        Database classes override this with a better form.
+
+        """
+        return f"{column} in ({', '.join([self.placeholder] * len(values))})", tuple(values)
+
+    def record_many(self, tablename, pkey_column, pkey_values, chunk_size=500):
+        """
+        Retrieve the records of many primary key values with a few queries.
+        Values are split in chunks of chunk_size and each chunk is read with one
+        query, see keyCondition. Records already cached by record are not read again.
+
+        Parameters
+        ----------
+        tablename : str
+            Name of the table
+
+        pkey_column : str
+            Name of the primary key column
+
+        pkey_values : iterable
+            Values for the pkey_column
+
+        chunk_size : int
+            Number of values in one query.
+
+        Returns
+        -------
+        Records : dict
+            Records by primary key value. Values without a record are left out.
+
+        """
+        if tablename not in self.tables.keys():
+            return {}
+        position = list(self.tables[tablename].columns.keys()).index(pkey_column)
+        version = self.cacheVersion(tablename)
+        result = {}
+        missing = []
+        with self.cache_lock:
+            for value in dict.fromkeys(pkey_values):
+                cached = self.record_cache.get((tablename, pkey_column, value))
+                if cached is not None and cached[0] == version:
+                    if cached[1] is not None:
+                        result[value] = cached[1]
+                else:
+                    missing.append(value)
+        for i in range(0, len(missing), chunk_size):
+            chunk = missing[i:i + chunk_size]
+            condition, params = self.keyCondition(pkey_column, chunk)
+            records = self.execute(f"select * from {tablename} where {condition}", params)
+            if records is None:
+                continue
+            found = {record[position]: record for record in records}
+            with self.cache_lock:
+                for value in chunk:
+                    self.record_cache.put((tablename, pkey_column, value), (version, found.get(value)))
+            result.update(found)
+        return result
+
+
+class DBSQLite(DB):
+    """
+    This class represents the SQLite database class.
+
+    Attributes
+    ----------
+
+    filename : str
+        Name of the SQLite database file.
+
+    connection : Connection handle
+        Connection handle to database.
+
+    statement_cache_size : int
+        Number of compiled statements the sqlite3 module keeps for each connection.
+        Parameterized statements are compiled once and reused from this cache.
+
+    pool_size : int
+        Maximum number of connections used at the same time, one per thread,
+        self.connection included.
+
+    """
+
+    def __init__(self, filename, statement_cache_size=256, pool_size=4):
+        DB.__init__(self, filename=filename)
+        self.statement_cache_size = statement_cache_size
+        self.setPool(SQLitePool(self.filename, pool_size, statement_cache_size))
+
+    def fingerprint(self):
+        """
+        Fingerprint of the schema: database file path and PRAGMA schema_version,
+        which SQLite increments on every schema change.
+
+        """
+        version = self.execute("PRAGMA schema_version")[0][0]
+        return f"sqlite:{os.path.abspath(self.filename)}:{version}"
+
+    def tableNames(self):
+        """
+        Return the names of tables and views from sqlite_master. Indexes and triggers are skipped.
+
+        """
+        return [name for name, in self.execute("""select name from sqlite_master
+                                                  where type in ('table', 'view') and name != 'dbwidgets_changelog'""")]
+
+    def adapt(self, values):
+        """
+        Return values with Decimal values, from numeric columns, as text. The
+        sqlite3 module cannot bind Decimal, and SQLite stores the text as a
+        number in columns with numeric affinity.
+
+        """
+        if isinstance(values, dict):
+            return {key: str(value) if isinstance(value, decimal.Decimal) else value for key, value in values.items()}
+        return [str(value) if isinstance(value, decimal.Decimal) else value for value in values]
+
+    def dataVersion(self):
+        """
+        Return PRAGMA data_version of self.connection. It changes when any other
+        connection, of this process or another one, commits to the database file.
+        Commits on self.connection itself are reported with notifyWrite.
+
+        """
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def begin(self, conn):
+        """
+        Start a transaction with BEGIN, the sqlite3 module would start it only before the first write.
+
+        """
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+
+    def changeFeed(self):
+        """
+        Return the SQLiteChangeFeed of the database, created on the first call.
+
+        """
+        if self.feed is None:
+            self.feed = SQLiteChangeFeed(self)
+        return self.feed
+
+    def interrupt(self, conn):
+        """
+        Abort the statement running on conn with sqlite3 interrupt().
+
+        """
+        conn.interrupt()
+
+    def introspectTable(self, tablename):
+        """
+        Extracts table schema from sqlite internal tables: pragma_table_info and pragma_foreign_key_list.
+
+        Returns
+        -------
+        Table : Table
+            Table object for tablename.
+
+        """
+        t = Table(tablename, self)
+        columns = self.execute("select * from pragma_table_info(?)", (tablename,))
+        fkeys = self.execute("SELECT * FROM pragma_foreign_key_list(?)", (tablename,))
+        for col in columns:
+            colname = col[1]
+            coltype = col[2]
+            pkey = False
+            if col[5] > 0:
+                pkey = True
+            t.addColumn(Column(colname, coltype, primary_key=pkey))
+        if fkeys is not None:
+            for fk in fkeys:
+                tbname = fk[2]
+                from_col = fk[3]
+                to_col = fk[4]
+                t.columns[from_col].addForeignKey(tbname, to_col)
+        return t
+
+
+class DBPostgres(DB):
+    """
+    This class represents the Postgresql database class.
+
+    Attributes
+    ----------
+    host : str
+        Host name of the server that database is running. Default is None
+
+    port : int
+        Port number for the database service. Default is None
+
+    dbname : str
+        Name of the database
+
+    tables : dict
+        Dictionary of tables in the database. Key value is table name.
+
+    connection : Connection handle
+        Connection handle to database.
+
+    statements : WeakKeyDictionary
+        PreparedStatementCache of each connection, connection as key.
+
+    schemas : tuple
+        Schemas to extract. Tables outside public schema are named schema.table. Default is ("public",)
+
+    unix_socket : str
+        Directory of the server's unix domain socket, used instead of host when given. Default is None
+
+    pool_size : int
+        Maximum number of connections used at the same time, self.connection included. Default is 4
+
+
+    """
+
+    placeholder = "%s"
+
+    def __init__(self, host=None, port=None, dbname=None, username=None, password=None, filename=None,
+                 statement_cache_size=64, cache_file=None, schemas=("public",), unix_socket=None, pool_size=4):
+        DB.__init__(self, host=host, port=port, dbname=dbname, filename=filename)
+
+        self.connection = None
+        self.connected = False
+        self.statement_cache_size = statement_cache_size
+        self.statements = weakref.WeakKeyDictionary()
+        self.stream_names = itertools.count(1)
+        self.schemas = tuple(schemas)
+        self.unix_socket = unix_socket
+        self.pool_size = pool_size
+        if (username is not None):
+            self.connect(username, password)
+        if self.connected:
+            self.extract(cache_file)
+
+    def endRead(self, conn):
+        """
+        Roll back the transaction psycopg2 opened for a read, unless the calling
+        thread is in transaction(). Without this the connection held by the GUI
+        thread would keep its table locks, and DDL from other sessions, like
+        the triggers of a change feed, would wait for it.
+
+        """
+        if not self.inTransaction() and conn.get_transaction_status() in (
+                psycopg2.extensions.TRANSACTION_STATUS_INTRANS, psycopg2.extensions.TRANSACTION_STATUS_INERROR):
+            conn.rollback()
+
+    def connect(self, user, passwd):
+        """
+        Open the connection pool. Connects through the unix domain socket in
+        self.unix_socket if given, otherwise through TCP to self.host and self.port.
+
+        """
+        connect_args = {"dbname": self.dbname, "user": user, "password": passwd,
+                        "host": self.host, "port": self.port}
+        if self.unix_socket is not None:
+            # libpq takes a directory as host for unix domain sockets
+            connect_args["host"] = self.unix_socket
+        connect_args = {key: value for key, value in connect_args.items() if value is not None}
+        self.connect_args = connect_args
+        try:
+            self.close()
+            # keep every connection open, see PostgresPool
+            self.setPool(PostgresPool(self.pool_size, self.pool_size, **connect_args))
+            self.connected = True
+        except psycopg2.OperationalError:
+            tb.print_exc()
+            self.connected = False
+
+    def _bulkInsert(self, tablename, columns, rows, batch_size=1000, progress=None):
+        """
+        Insert rows into columns of tablename in one transaction with COPY FROM
+        STDIN, one COPY of batch_size rows at a time in csv format. Internal,
+        see Table.bulkInsert.
+
+        Returns
+        -------
+        Number of rows : int
+            Number of rows inserted.
+
+        """
+        query_string = f"COPY {tablename} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        datatypes = [(self.tables[tablename].columns[name].datatype or "").lower() for name in columns]
+        count = 0
+        rows = iter(rows)
+        with self.transaction() as cur:
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if len(batch) == 0:
+                    break
+                buffer = io.StringIO()
+                buffer.writelines(",".join(self.copyValue(value, datatype) for value, datatype in zip(row, datatypes)) + "\n" for row in batch)
+                buffer.seek(0)
+                with self.instrument(query_string) as event:
+                    cur.copy_expert(query_string, buffer)
+                    event.executed()
+                    event.rows = len(batch)
+                count += len(batch)
+                if progress is not None:
+                    progress(count)
+        self.notifyWrite(tablename)
+        return count
+
+    @staticmethod
+    def copyValue(value, datatype=""):
+        """
+        Format value as a COPY csv field of a column of datatype. NULL is
+        written as nothing and text is always quoted, so an empty string is not
+        read as NULL. Values of json columns are written as json, lists and
+        tuples of other columns as array literals.
+
+        Raises ValueError for a dict for a column that is not json.
+
+        """
+        if value is None:
+            return ""
+        if "json" in datatype and not isinstance(value, str):
+            value = json.dumps(value, ensure_ascii=False, default=str)
+        elif isinstance(value, bool):
+            return "true" if value else "false"
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            return "\\x" + bytes(value).hex()
+        elif isinstance(value, (list, tuple)):
+            value = DBPostgres.arrayLiteral(value)
+        elif isinstance(value, dict):
+            raise ValueError(f"Cannot write a dict to a {datatype} column : {value!r}")
+        return '"' + str(value).replace('"', '""') + '"'
+
+    @staticmethod
+    def arrayLiteral(values):
+        """
+        Format a list as a Postgresql array literal, {"a","b"}, nested lists as multidimensional arrays.
+
+        """
+        items = []
+        for item in values:
+            if item is None:
+                items.append("NULL")
+            elif isinstance(item, (list, tuple)):
+                items.append(DBPostgres.arrayLiteral(item))
+            else:
+                if isinstance(item, bool):
+                    item = "true" if item else "false"
+                items.append('"' + str(item).replace("\\", "\\\\").replace('"', '\\"') + '"')
+        return "{" + ",".join(items) + "}"
+
+    def changeFeed(self):
+        """
+        Return the PostgresChangeFeed of the database, created on the first call.
+
+        """
+        if self.feed is None:
+            self.feed = PostgresChangeFeed(self, **self.connect_args)
+        return self.feed
+
+    def interrupt(self, conn):
+        """
+        Send a cancel request for the statement running on conn.
+
+        """
+        conn.cancel()
+
+    def keyCondition(self, column, values):
+        """
+        Return a predicate matching column with any of values, and its parameters.
+        The values are sent as one array parameter, so every chunk uses the same prepared statement.
+
+            column = ANY(%s)
+
+        """
+        return f"{column} = ANY({self.placeholder})", (list(values),)
+
+    def streamCursor(self, conn, query_string=None, params=None, block_size=1000):
+        """
+        Return a named, server side cursor of conn. The rows of its query stay
+        on the server and fetchmany brings block_size rows at a time, so large
+        results are read in constant memory. The cursor is declared WITH HOLD,
+        it stays open across commits of conn until it is closed.
+
+        Outside transaction() the DECLARE is committed right away. A held cursor
+        is dropped if the transaction that declared it is rolled back, and
+        endRead rolls back after every other read of conn.
+
+        Server side cursors cannot use prepared statements, query_string is sent as is.
+
+        """
+        cur = conn.cursor(name=f"dbwidgets_stream_{next(self.stream_names)}", withhold=True)
+        cur.itersize = block_size
+        if query_string is not None:
+            cur.execute(query_string, params)
+            if not self.inTransaction():
+                conn.commit()
+        return cur
+
+    def run_statement(self, cur, query_string, params=None):
+        """
+        Run query_string on cur. Parameterized statements are prepared on the
+        server once per connection and executed from its statement cache afterwards.
+
+        """
+        if params is None:
+            cur.execute(query_string)
+        else:
+            statements = self.statements.get(cur.connection)
+            if statements is None:
+                statements = PreparedStatementCache(self.statement_cache_size)
+                self.statements[cur.connection] = statements
+            statements.execute(cur, query_string, params)
+
+    def fingerprint(self):
+        """
+        Fingerprint of the schema: md5 of the oids, columns, column types with
+        their modifiers, like the length of varchar(20), defaults and key
+        constraints of the tables in self.schemas, read from pg_catalog.
+
+        """
+        digest = self.execute("""SELECT md5(coalesce(string_agg(item, ',' ORDER BY item), ''))
+                 FROM (
+                    SELECT
+                        c.oid::text || ':' || c.relname || ':' || a.attnum || ':' || a.attname || ':' ||
+                        a.atttypid::text || ':' || a.atttypmod::text || ':' ||
+                        coalesce(pg_get_expr(d.adbin, d.adrelid), '') AS item
+                    FROM
+                        pg_class AS c
+                    JOIN
+                        pg_namespace AS n ON n.oid = c.relnamespace
+                    JOIN
+                        pg_attribute AS a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+                    LEFT JOIN
+                        pg_attrdef AS d ON d.adrelid = c.oid AND d.adnum = a.attnum
+                    WHERE
+                        n.nspname::text = ANY(%s) AND c.relkind IN ('r', 'v', 'm', 'f', 'p')
+                    UNION ALL
+                    SELECT
+                        con.oid::text || ':' || con.conrelid::text || ':' || pg_get_constraintdef(con.oid)
+                    FROM
+                        pg_constraint AS con
+                    JOIN
+                        pg_namespace AS n ON n.oid = con.connamespace
+                    WHERE
+                        n.nspname::text = ANY(%s) AND con.contype IN ('p', 'f')
+                 ) AS catalog""", (list(self.schemas), list(self.schemas)))[0][0]
+        return f"postgres:{self.host}:{self.port}:{self.dbname}:{','.join(self.schemas)}:{digest}"
+
+    def tableName(self, schema, relname):
+        """
+        Return the key used in self.tables for a table. Tables in public schema
+        are known by their name, tables in other schemas by schema.name.
+
+        """
+        if schema == "public":
+            return relname
+        return f"{schema}.{relname}"
+
+    def tableNames(self):
+        """
+        Return the names of the tables and views in self.schemas.
+
+        """
+        names = self.execute("""SELECT n.nspname, c.relname
+                 FROM pg_class AS c
+                 JOIN pg_namespace AS n ON n.oid = c.relnamespace
+                 WHERE n.nspname::text = ANY(%s) AND c.relkind IN ('r', 'v', 'm', 'f', 'p')
+                 ORDER BY n.nspname, c.relname""", (list(self.schemas),))
+        return [self.tableName(schema, relname) for schema, relname in names]
+
+    def catalog(self, condition, params):
+        """
+        Read columns, defaults, primary keys and foreign keys of the tables that
+        satisfy condition from pg_class, pg_attribute and pg_constraint in one query.
+        Each column of a composite key is returned with its matching referenced column.
+
+        Returns
+        -------
+        List of records : list
+            (schema, table, column, type, default, primary key, fk schema, fk table, fk column)
+            ordered by table and column position.
+
+        """
+        return self.execute(f"""SELECT
+                    n.nspname, c.relname, a.attname,
+                    format_type(a.atttypid, a.atttypmod),
+                    pg_get_expr(d.adbin, d.adrelid),
+                    pk.oid IS NOT NULL,
+                    fn.nspname, fc.relname, fa.attname
                  FROM
-                    information_schema.table_constraints AS tc
-                 JOIN 
-                    information_schema.key_column_usage AS kcu ON tc.constraint_name = kcu.constraint_name
-                 JOIN 
-                    information_schema.constraint_column_usage AS ccu ON ccu.constraint_name = tc.constraint_name
-                 WHERE 
-                    constraint_type = 'FOREIGN KEY';""")
-
-        for table in tablenames:
-            t = Table(table[0])
-            for col in columns:
-                if col[0] == table[0]:
-                    t.addColumn(Column(col[1], col[2], default=col[3]))
-            self.tables[table[0]] = t
-
-        for pkey_column, tablename in primary_keys:
-            self.tables[tablename].columns[pkey_column].setPrimary()
-
-        for tablename, column, fktablename, fkcolumn in foreign_keys:
-            self.tables[tablename].columns[column].addForeignKey(fktablename, fkcolumn)
+                    pg_class AS c
+                 JOIN
+                    pg_namespace AS n ON n.oid = c.relnamespace
+                 JOIN
+                    pg_attribute AS a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+                 LEFT JOIN
+                    pg_attrdef AS d ON d.adrelid = c.oid AND d.adnum = a.attnum
+                 LEFT JOIN
+                    pg_constraint AS pk ON pk.conrelid = c.oid AND pk.contype = 'p' AND a.attnum = ANY(pk.conkey)
+                 LEFT JOIN LATERAL (
+                    SELECT con.confrelid, con.confkey[k.i] AS attnum
+                    FROM pg_constraint AS con, generate_subscripts(con.conkey, 1) AS k(i)
+                    WHERE con.conrelid = c.oid AND con.contype = 'f' AND con.conkey[k.i] = a.attnum
+                    ORDER BY con.conname
+                    LIMIT 1
+                 ) AS fk ON true
+                 LEFT JOIN
+                    pg_class AS fc ON fc.oid = fk.confrelid
+                 LEFT JOIN
+                    pg_namespace AS fn ON fn.oid = fc.relnamespace
+                 LEFT JOIN
+                    pg_attribute AS fa ON fa.attrelid = fk.confrelid AND fa.attnum = fk.attnum
+                 WHERE
+                    c.relkind IN ('r', 'v', 'm', 'f', 'p') AND {condition}
+                 ORDER BY
+                    n.nspname, c.relname, a.attnum""", params)
+
+    def buildTables(self, records):
+        """
+        Group the records returned by catalog into Table objects in a single pass.
+
+        Returns
+        -------
+        dict : dict
+            Tables, table name as key.
+
+        """
+        tables = {}
+        t = None
+        for schema, relname, colname, coltype, default, pkey, fkschema, fktable, fkcolumn in records:
+            name = self.tableName(schema, relname)
+            if t is None or t.name != name:
+                t = Table(name, self)
+                tables[name] = t
+            col = Column(colname, coltype, primary_key=pkey, default=default)
+            if fktable is not None:
+                col.addForeignKey(self.tableName(fkschema, fktable), fkcolumn)
+            t.addColumn(col)
+        return tables
+
+    def introspect(self):
+        """
+        Extracts table schema of self.schemas from postgresql catalog tables
+        (pg_class, pg_attribute, pg_constraint) with a single query.
+
+        Fills self.tables dictionary.
+
+        """
+        self.tables = self.buildTables(self.catalog("n.nspname::text = ANY(%s)", (list(self.schemas),)))
+
+    def introspectTable(self, tablename):
+        """
+        Extracts the schema of one table from postgresql catalog tables.
+
+        Returns
+        -------
+        Table : Table
+            Table object for tablename.
 
+        """
+        if "." in tablename:
+            schema, relname = tablename.split(".", 1)
+        else:
+            schema, relname = "public", tablename
+        tables = self.buildTables(self.catalog("n.nspname = %s AND c.relname = %s", (schema, relname)))
+        return tables.get(tablename, Table(tablename, self))
 
 if __name__ == "__main__":
     db = DBSQLite("test.db")
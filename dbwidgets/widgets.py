@@ -2,7 +2,460 @@ from PySide2.QtWidgets import QTableWidgetItem, QWidget
 from PySide2.QtWidgets import QVBoxLayout
 from PySide2.QtCore import Signal
 from PySide2.QtCore import (QCoreApplication, QMetaObject )
+from PySide2.QtCore import (QAbstractTableModel, QAbstractListModel, QModelIndex, Qt)
+from PySide2.QtCore import (QObject, QRunnable, QThreadPool, QTimer, QSocketNotifier, QStringListModel)
 from PySide2.QtWidgets import *
+from dbwidgets import KeysetPager, LRUCache, EditBuffer, fetchBlocks, exportBlocks
+import functools
+import re
+import threading
+import traceback as tb
+from collections import OrderedDict
+
+
+def instrumented(method):
+    """
+    Decorator attributing the statements run by method to its widget in DB.stats.
+
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.db.source(self):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class QuerySignals(QObject):
+    """
+    Signals of a QueryWorker. The object is created on the GUI thread, so the
+    signals emitted from the worker thread are delivered to the GUI thread as queued calls.
+
+    """
+    signalResult = Signal(object, object)
+
+
+class QueryWorker(QRunnable):
+    """
+    Runs a query on a QThreadPool thread, using a connection of that thread from
+    the database pool, and emits the records with signals.signalResult.
+    A cancelled worker emits None as records.
+
+    Attributes
+    ----------
+    db : DB object
+        Database to query.
+
+    query_string : str
+        Query to execute.
+
+    params : sequence or None
+        Values for the placeholders in query_string.
+
+    token : int
+        Load number, emitted with the records so the receiver can drop stale results.
+
+    source : str or None
+        Name of the widget the query is run for, see DB.source.
+
+    block_size : int
+        Number of records read with each fetchmany.
+
+    """
+
+    block_size = 1000
+
+    def __init__(self, db, query_string, params, token, source=None):
+        super(QueryWorker, self).__init__()
+        self.db = db
+        self.query_string = query_string
+        self.params = params
+        self.token = token
+        self.source = source
+        self.signals = QuerySignals()
+        self.cancelled = False
+        self.connection = None
+        self.lock = threading.Lock()
+        # BackgroundLoader keeps the worker until its result arrives
+        self.setAutoDelete(False)
+
+    def run(self):
+        records = None
+        try:
+            if not self.cancelled:
+                with self.db.pooled() as conn:
+                    with self.lock:
+                        self.connection = conn
+                    try:
+                        with self.db.source(self.source), self.db.instrument(self.query_string, self.params) as event:
+                            cur = conn.cursor()
+                            self.db.run_statement(cur, self.query_string, self.params)
+                            event.executed()
+                            records = []
+                            # read in blocks, so a cancelled load stops early
+                            for block in fetchBlocks(cur, self.block_size):
+                                if self.cancelled:
+                                    break
+                                records.extend(block)
+                            event.fetched(len(records))
+                            cur.close()
+                        self.db.endRead(conn)
+                    except:
+                        # an interrupted query fails on purpose, report only real errors
+                        if not self.cancelled:
+                            tb.print_exc()
+                            print("Cannot execute ", self.query_string)
+                        self.db.endRead(conn)
+                    with self.lock:
+                        self.connection = None
+        finally:
+            if self.cancelled:
+                records = None
+            self.signals.signalResult.emit(self.token, records)
+
+    def cancel(self):
+        """
+        Mark the query as cancelled and interrupt it if it is running.
+
+        """
+        with self.lock:
+            self.cancelled = True
+            if self.connection is not None:
+                self.db.interrupt(self.connection)
+
+
+class BackgroundLoader(QObject):
+    """
+    Loads the records of a widget on a QThreadPool and passes them to apply on the GUI thread.
+
+    Only the latest load is applied. Starting a new load cancels the previous
+    one: it is taken out of the thread pool if it has not started yet, or
+    interrupted on the database if it is running. Its result is dropped if it still arrives.
+
+    While a query runs, widget.setLoading(True) is called, and widget.setLoading(False) after the result is applied.
+
+    Attributes
+    ----------
+    widget : QWidget
+        Widget to load.
+
+    apply : callable
+        Called with the key and the records of the latest load.
+
+    threadpool : QThreadPool
+        Thread pool to run queries on. Default is the global instance.
+
+    """
+
+    def __init__(self, widget, apply, threadpool=None):
+        super(BackgroundLoader, self).__init__(widget)
+        self.widget = widget
+        self.apply = apply
+        self.threadpool = threadpool if threadpool is not None else QThreadPool.globalInstance()
+        self.token = 0
+        self.workers = {}
+        self.keys = {}
+
+    def load(self, query_string, params=None, key=None, apply=None):
+        """
+        Start loading query_string in the background, cancelling the running load.
+        key is passed to apply with the records. apply replaces self.apply for this load.
+
+        """
+        self.cancel()
+        self.token += 1
+        worker = QueryWorker(self.widget.db, query_string, params, self.token,
+                             self.widget.db.sourceName(self.widget))
+        worker.signals.signalResult.connect(self.finished)
+        self.workers[self.token] = worker
+        self.keys[self.token] = (key, apply if apply is not None else self.apply)
+        self.widget.setLoading(True)
+        self.threadpool.start(worker)
+
+    def cancel(self):
+        """
+        Cancel the running load, if any.
+
+        """
+        worker = self.workers.get(self.token)
+        if worker is not None:
+            worker.cancel()
+            if self.threadpool.tryTake(worker):
+                # never started, no result will come
+                del self.workers[self.token]
+                del self.keys[self.token]
+
+    def stop(self):
+        """
+        Cancel the running load and leave the loading state, used when the
+        widget gets its records without a query.
+
+        """
+        if self.isLoading():
+            self.cancel()
+            self.token += 1
+            self.widget.setLoading(False)
+
+    def isLoading(self):
+        """
+        True if the latest load has not finished yet.
+
+        """
+        return self.token in self.workers
+
+    def finished(self, token, records):
+        worker = self.workers.pop(token, None)
+        key, apply = self.keys.pop(token, (None, None))
+        if token != self.token or worker is None or worker.cancelled:
+            return
+        apply(key, records)
+        self.widget.setLoading(False)
+
+
+class SignalCoalescer(QObject):
+    """
+    Passes only the last value of a burst of master ids to a slot, so a detail
+    widget is refilled once for the final selection instead of once for every
+    intermediate item while the user scrolls or holds an arrow key.
+
+    Modes
+
+    * debounce: the value is delivered after delay milliseconds without a new value (trailing edge).
+    * latest: the value is delivered on the next event loop iteration, values
+      arriving before that replace it (latest value wins).
+
+    Attributes
+    ----------
+    slot : callable
+        Called with the last value.
+
+    mode : str
+        Either debounce or latest.
+
+    delay : int
+        Quiet time in milliseconds for debounce mode.
+
+    """
+
+    modes = ("debounce", "latest")
+
+    def __init__(self, slot, mode="debounce", delay=150, parent=None):
+        super(SignalCoalescer, self).__init__(parent)
+        if mode not in self.modes:
+            raise Exception(f"Unknown coalesce mode {mode}, use one of {', '.join(self.modes)}")
+        self.slot = slot
+        self.mode = mode
+        self.delay = delay
+        self.value = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay if mode == "debounce" else 0)
+        self.timer.timeout.connect(self.deliver)
+
+    def push(self, value):
+        """
+        Receive a value from the master signal.
+
+        """
+        self.value = value
+        if self.mode == "debounce" or not self.timer.isActive():
+            self.timer.start()
+
+    def deliver(self):
+        self.slot(self.value)
+
+
+def connectMaster(widget, otherwidget, coalesce=None, coalesce_delay=150):
+    """
+    Connect the master signal of otherwidget to widget.refill, through a
+    SignalCoalescer if coalesce is debounce or latest.
+
+    """
+    slot = widget.refill
+    if coalesce is not None:
+        widget.coalescer = SignalCoalescer(widget.refill, coalesce, coalesce_delay, widget)
+        slot = widget.coalescer.push
+    masterSignal(otherwidget).connect(slot)
+
+
+class ChangeWatcher(QObject):
+    """
+    Polls a ChangeFeed from the Qt event loop. Feeds with a socket, like the
+    Postgresql LISTEN connection, are polled when the socket becomes readable,
+    the others on a timer.
+
+    Attributes
+    ----------
+    feed : ChangeFeed
+        Feed to poll.
+
+    interval : int
+        Polling interval in milliseconds for feeds without a socket.
+
+    """
+
+    def __init__(self, feed, interval=500, parent=None):
+        super(ChangeWatcher, self).__init__(parent)
+        self.feed = feed
+        self.notifier = None
+        self.timer = None
+        if feed.fileno() is not None:
+            self.notifier = QSocketNotifier(feed.fileno(), QSocketNotifier.Read, self)
+            self.notifier.activated.connect(self.poll)
+        else:
+            self.timer = QTimer(self)
+            self.timer.setInterval(interval)
+            self.timer.timeout.connect(self.poll)
+            self.timer.start()
+
+    def poll(self):
+        try:
+            self.feed.poll()
+        except:
+            tb.print_exc()
+            print("Cannot read changes of ", self.feed.db.filename)
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+        if self.notifier is not None:
+            self.notifier.setEnabled(False)
+
+
+def changeWatcher(feed, interval=500):
+    """
+    Return the ChangeWatcher of feed, created on the first call. Every widget
+    watching the same database shares it.
+
+    """
+    if getattr(feed, "watcher", None) is None:
+        feed.watcher = ChangeWatcher(feed, interval)
+    return feed.watcher
+
+
+def watchChanges(widget, interval=500):
+    """
+    Subscribe widget.applyChange to the changes of widget.table. The
+    subscription ends when the widget is destroyed.
+
+    """
+    feed = widget.db.changeFeed()
+    changeWatcher(feed, interval)
+    callback = widget.applyChange
+    feed.subscribe(widget.table, callback)
+    widget.destroyed.connect(lambda obj=None, table=widget.table: feed.unsubscribe(table, callback))
+
+
+def sameKey(key, other):
+    # keys from change events went through json, compare as text
+    return len(key) == len(other) and all(str(a) == str(b) for a, b in zip(key, other))
+
+
+class MasterLink:
+    """
+    State of a master/detail connection on the detail widget: the detail
+    query, which is the same statement for every master id, and an optional
+    LRU cache of the records of each master id.
+
+    In preload mode the whole detail table is read once, ordered by the
+    foreign key column, and indexed by foreign key value. The records of a
+    master id are then a slice of the preloaded rows, no query is run.
+
+    Cached and preloaded records are dropped when the detail table changes,
+    detected by DB.dataVersion (PRAGMA data_version for SQLite) and
+    DB.tableVersion, which is increased by DB.notifyWrite. Preloaded rows
+    are read again on the next access.
+
+    Attributes
+    ----------
+    db : DB object
+        Database of the detail widget.
+
+    table : str
+        Detail table name.
+
+    query : str
+        Detail query with one placeholder for the master id.
+
+    cache : LRUCache or None
+        Records of each master id, None if caching is disabled.
+
+    preload_query : str or None
+        Query returning the foreign key as first column followed by the detail
+        columns, ordered by the foreign key. None if preload is disabled.
+
+    """
+
+    def __init__(self, db, tablename, query_string, cache_size=0, cache_bytes=None, preload_query=None):
+        self.db = db
+        self.table = tablename
+        self.query = query_string
+        self.cache = None
+        self.stamp = None
+        self.preload_query = preload_query
+        self.rows = None
+        self.blocks = None
+        if cache_size > 0:
+            self.cache = LRUCache(cache_size, cache_bytes)
+
+    def version(self):
+        return (self.db.dataVersion(), self.db.tableVersion(self.table))
+
+    def preload(self):
+        """
+        Read the detail table with preload_query and index the rows by foreign key.
+        self.blocks maps each foreign key value to the (start, end) slice of self.rows.
+
+        """
+        self.stamp = self.version()
+        records = self.db.execute(self.preload_query)
+        self.rows = []
+        self.blocks = {}
+        if records is None:
+            return
+        start = 0
+        for i, record in enumerate(records):
+            if i > 0 and record[0] != records[i - 1][0]:
+                self.blocks[records[i - 1][0]] = (start, i)
+                start = i
+            self.rows.append(record[1:])
+        if len(records) > 0:
+            self.blocks[records[-1][0]] = (start, len(records))
+
+    def cached(self, value):
+        """
+        Return the cached records for master id value, None if they are not cached or stale.
+
+        """
+        if self.preload_query is not None:
+            if self.blocks is None or self.version() != self.stamp:
+                self.preload()
+            if value not in self.blocks:
+                return []
+            start, end = self.blocks[value]
+            return self.rows[start:end]
+        if self.cache is None:
+            return None
+        stamp = self.version()
+        if stamp != self.stamp:
+            self.cache.clear()
+            self.stamp = stamp
+            return None
+        return self.cache.get(value)
+
+    def store(self, value, records, version):
+        """
+        Cache the records of master id value, read when the table was at
+        version. version is taken before the query, so records read while
+        the table changed are stale on the next access, see cached.
+
+        """
+        if self.cache is None or records is None:
+            return
+        if version != self.stamp:
+            self.cache.clear()
+            self.stamp = version
+        self.cache.put(value, records)
+
 
 class DBComboBox(QComboBox):
     """
@@ -11,86 +464,1883 @@ class DBComboBox(QComboBox):
     parent : QWidget
         Parent widget for the combobox
 
-    db : DB object
-        Database to connect to.
+    db : DB object
+        Database to connect to.
+
+    table : str
+        Name of the table
+
+    textcolumn : str
+        Name of the column to display
+
+    idcolumn : str
+        Name of the column to emit via signal as id.
+
+    default_id : Variable, optional
+        Value of idcolumn to set as selected record.
+
+    background : bool, optional
+        Run the queries on a thread pool instead of the GUI thread. See setBackgroundLoading.
+
+    Returns
+    -------
+    DBComboBox : dbwidgets.DBComboBox
+        DBComboBox widget
+
+    """
+
+    signalMasterId = Signal(object)
+    signalLoading = Signal(bool)
+    def __init__(self, parent,  db, tablename, textcolumn, idcolumn, default_id = None, background=False):
+        super(DBComboBox, self).__init__(parent)
+        self.table = tablename
+        self.db = db
+        self.textcolumn = textcolumn
+        self.idcolumn = idcolumn
+        self.mastercolumn = None                
+        self.dataquery = f"select {idcolumn}, {textcolumn} from {self.table}"
+        self.detailquery = None
+        self.link = None
+        self.default_id = default_id
+        self.loader = None
+        self.query = self.dataquery
+        self.params = None
+        if background:
+            self.setBackgroundLoading(True)
+        self.selected_id = None
+        if self.loader is not None:
+            self.currentIndexChanged.connect(self.idxChanged)
+            self.fill()
+        else:
+            self.fill()
+            self.currentIndexChanged.connect(self.idxChanged)
+            self.selectId(self.default_id)
+            self.default_id = None
+
+    def setBackgroundLoading(self, enabled=True, threadpool=None):
+        """
+        Run fill and refill queries on a thread pool. The combobox is disabled and
+        signalLoading emits True while a query runs. If a new master id arrives
+        before the previous query finishes, the previous query is cancelled.
+
+        Parameters
+        ----------
+
+        enabled : bool
+            Load in background if True, on the GUI thread if False.
+
+        threadpool : QThreadPool, optional
+            Thread pool for the queries. Default is QThreadPool.globalInstance()
+
+        """
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader.deleteLater()
+            self.loader = None
+        if enabled:
+            self.loader = BackgroundLoader(self, self.loaded, threadpool)
+
+    def setLoading(self, loading):
+        """
+        Show the loading state while a background query runs.
+
+        """
+        self.setEnabled(not loading)
+        if loading:
+            self.setCursor(Qt.BusyCursor)
+        else:
+            self.unsetCursor()
+        self.signalLoading.emit(loading)
+
+    def load(self, query_string, params=None, key=None):
+        """
+        Run query_string and put its records into the combobox, in background if enabled.
+        key is the master id for detail queries, None otherwise.
+
+        """
+        if key is not None and self.link is not None:
+            # the version before the query, see MasterLink.store
+            key = (key, self.link.version())
+        if self.loader is not None:
+            self.loader.load(query_string, params, key)
+        else:
+            self.loaded(key, self.db.execute(query_string, params))
+
+    def loaded(self, key, values):
+        """
+        Put the records of a finished load into the combobox, caching detail
+        records by master id. key is the master id and the table version, see load.
+
+        """
+        if key is not None and self.link is not None:
+            self.link.store(key[0], values, key[1])
+        self.setItems(values)
+
+    def setItems(self, values):
+        """
+        Replace the items of the combobox with values, a list of (id, text) records.
+
+        Signals are blocked while the items change and the new selection is
+        emitted once at the end, so the detail widgets of this combobox are
+        refilled once, not for every intermediate index.
+
+        """
+        self.blockSignals(True)
+        self.clear()
+        if values is not None:
+            for id, text in values:
+                self.addItem(text, userData=id)
+        if self.default_id is not None and self.loader is not None:
+            # first background fill is done, default_id can be selected now
+            i = self.findData(self.default_id)
+            if i >= 0:
+                self.setCurrentIndex(i)
+            self.default_id = None
+        self.blockSignals(False)
+        self.idxChanged()
+
+    def selectId(self, id_value):
+        """
+        Select the item with the given id, if it exists.
+
+        """
+        if id_value is None:
+            return
+        i = self.findData(id_value)
+        if i >= 0:
+            self.setCurrentIndex(i)
+
+    @instrumented
+    def refill(self,obj):
+        """
+        Reset the contents of the combobox filtering with obj, which send by another widget.
+
+        :param obj: Emitted via another widget
+
+        """
+        self.query, self.params = self.detailquery, (obj,)
+        values = self.link.cached(obj)
+        if values is not None:
+            if self.loader is not None:
+                self.loader.stop()
+            self.setItems(values)
+        else:
+            self.load(self.detailquery, (obj,), obj)
+
+            
+    def idxChanged(self):
+        """
+        If another item  is selected, the id of that column emitted via self.signalMasterId.
+
+        """
+        self.selected_id = self.itemData(self.currentIndex())
+        self.signalMasterId.emit(self.itemData(self.currentIndex()))
+
+                
+    @instrumented
+    def fill(self):
+        """
+        Fills the combobox from table rows. The rows come from the lookup cache
+        of the database, shared with the other widgets showing the same columns, see DB.lookup.
+
+        """
+        self.query, self.params = self.dataquery, None
+        values = self.db.cachedLookup(self.table, self.idcolumn, self.textcolumn)
+        if values is not None:
+            if self.loader is not None:
+                self.loader.stop()
+            self.setItems(values)
+        elif self.loader is not None:
+            self.loader.load(self.dataquery, key=self.db.cacheVersion(self.table), apply=self.lookupLoaded)
+        else:
+            self.setItems(self.db.lookup(self.table, self.idcolumn, self.textcolumn))
+
+    def lookupLoaded(self, version, values):
+        self.db.storeLookup(self.table, self.idcolumn, self.textcolumn, values, version)
+        self.setItems(values)
+
+    def watchChanges(self, interval=500):
+        """
+        Keep the items current with the changes made to the table by other
+        connections and processes, see DB.changeFeed. Only the changed items are
+        updated.
+
+        :param interval: Polling interval in milliseconds for databases without notifications.
+
+        """
+        watchChanges(self, interval)
+
+    @instrumented
+    def applyChange(self, event):
+        """
+        Update the item of the row changed in event. Reloads all items if idcolumn is not the primary key.
+
+        """
+        if self.db.tables[self.table].primaryKey() != [self.idcolumn]:
+            self.load(self.query, self.params)
+            return
+        index = -1
+        for i in range(self.count()):
+            if sameKey((self.itemData(i),), event.key):
+                index = i
+                break
+        records = []
+        if event.op != "DELETE":
+            records = self.db.execute(f"select * from ({self.query}) dbwidgets_row where {self.idcolumn} = {self.db.placeholder}",
+                                      tuple(self.params or ()) + tuple(event.key))
+        if records is not None and len(records) > 0:
+            id, text = records[0]
+            if index >= 0:
+                self.setItemText(index, str(text))
+            else:
+                self.blockSignals(True)
+                self.addItem(text, userData=id)
+                self.blockSignals(False)
+        elif index >= 0:
+            current = self.currentIndex()
+            self.blockSignals(True)
+            self.removeItem(index)
+            self.blockSignals(False)
+            if index == current:
+                self.idxChanged()
+
+
+    def setMaster(self, otherwidget, mycolumn_name, cache_size=0, cache_bytes=None, preload=False,
+                  coalesce=None, coalesce_delay=150):
+        """
+        Sets the master widget. The items in the combobox will be filtered with the value
+        comes from the master widget's signalMasterId signal.
+
+        Raises exception if
+
+        * There is no foreign key in the current table,
+        * Foreign key table name is not the same as master table name
+        * Foreign key column name is not present inside master table.
+
+        :param otherwidget: Master widget that holds the master table.
+        :param mycolumn_name: Column name in the detail table.
+        :param cache_size: Number of master ids to keep the items of, 0 disables the cache.
+        :param cache_bytes: Memory limit of the cache in bytes, optional.
+        :param preload: Read the whole detail table once and serve every master id from memory.
+        :param coalesce: None, debounce or latest. Refill only for the last of a burst of master ids, see SignalCoalescer.
+        :param coalesce_delay: Quiet time in milliseconds for debounce.
+
+        """
+
+        mycolumn = self.db.tables[self.table].columns[mycolumn_name]
+        # check if requested connection is valid
+        if ( mycolumn.foreign_key_table is None ):
+            raise Exception(f"Requested connection between {self.table.name} and {otherwidget.table.name} cannot be made, no foreign key for {mycolumn_name} defined.")
+        
+        elif ( mycolumn.foreign_key_table != otherwidget.table):
+            raise Exception(f"Requested connection between {self.table} and {otherwidget.table} cannot be made, wrong table name")
+
+        elif ( mycolumn.foreign_key_table == otherwidget.table): # check existence of foreign key column
+            if (mycolumn.foreign_key_column not in otherwidget.db.tables[otherwidget.table].columns.keys()):
+                raise Exception(f"Foreign key column {mycolumn.foreign_key_column} not found in {otherwidget.table}")
+            else: # everything looks ok, create the connection
+                connectMaster(self, otherwidget, coalesce, coalesce_delay)
+                self.mastercolumn = mycolumn_name
+                # same statement text for every master value, so the database can reuse its plan
+                self.detailquery = f"{self.dataquery} where {self.mastercolumn} = {self.db.placeholder}"
+                preload_query = None
+                if preload:
+                    preload_query = (f"select {self.mastercolumn}, {self.idcolumn}, {self.textcolumn} "
+                                     f"from {self.table} order by {self.mastercolumn}")
+                self.link = MasterLink(self.db, self.table, self.detailquery, cache_size, cache_bytes, preload_query)
+                self.refill(otherwidget.selected_id)
+                
+class LookupModel(QAbstractListModel):
+    """
+    Items of a DBLookupComboBox, (id, text) records in id order. The row
+    count comes from a count query. Rows are read in blocks of block_size
+    only when the view asks for them, so only the visible rows are read.
+    A block next to a block already read is located by primary key. Other
+    blocks are read with OFFSET. At most max_blocks blocks are kept.
+
+    The row of an id that is already read comes from an id to row index. For
+    other ids it comes from one count query on the primary key index.
+
+    Attributes
+    ----------
+    db : DB object
+        Database to connect to.
+
+    table : str
+        Name of the table
+
+    idcolumn : str
+        Primary key column, UserRole data of the rows.
+
+    textcolumn : str
+        Column to display.
+
+    block_size : int
+        Number of rows read at a time.
+
+    total : int
+        Number of rows.
+
+    blocks : OrderedDict
+        Blocks read, block number as key, least recently used first.
+
+    idrows : dict
+        Row of each id in the blocks read.
+
+    """
+
+    def __init__(self, db, tablename, idcolumn, textcolumn, block_size=200, max_blocks=64, parent=None):
+        super(LookupModel, self).__init__(parent)
+        self.db = db
+        self.table = tablename
+        self.idcolumn = idcolumn
+        self.textcolumn = textcolumn
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.condition = None
+        self.params = ()
+        self.total = 0
+        self.blocks = OrderedDict()
+        self.idrows = {}
+
+    @instrumented
+    def setCondition(self, condition=None, params=()):
+        """
+        Reset the model to the rows satisfying condition. Only the count is read here.
+
+        """
+        self.beginResetModel()
+        self.condition = condition
+        self.params = tuple(params)
+        self.blocks = OrderedDict()
+        self.idrows = {}
+        self.total = self.count()
+        self.endResetModel()
+
+    @instrumented
+    def refresh(self):
+        """
+        Count and read the rows again, after rows were inserted or deleted.
+
+        """
+        self.setCondition(self.condition, self.params)
+
+    def where(self, predicates=(), params=()):
+        predicates = list(predicates)
+        params = list(params)
+        if self.condition is not None:
+            predicates.insert(0, f"({self.condition})")
+            params[0:0] = self.params
+        if len(predicates) == 0:
+            return "", params
+        return " where " + " and ".join(predicates), params
+
+    def count(self, below=None):
+        predicates, params = [], []
+        if below is not None:
+            predicates.append(f"{self.idcolumn} < {self.db.placeholder}")
+            params.append(below)
+        condition, params = self.where(predicates, params)
+        records = self.db.execute(f"select count(*) from {self.table}{condition}", params)
+        return records[0][0] if records else 0
+
+    def select(self, after=None, before=None, offset=None):
+        predicates, params = [], []
+        if after is not None:
+            predicates.append(f"{self.idcolumn} > {self.db.placeholder}")
+            params.append(after)
+        if before is not None:
+            predicates.append(f"{self.idcolumn} < {self.db.placeholder}")
+            params.append(before)
+        condition, params = self.where(predicates, params)
+        direction = " desc" if before is not None else ""
+        query_string = (f"select {self.idcolumn}, {self.textcolumn} from {self.table}{condition} "
+                        f"order by {self.idcolumn}{direction} limit {int(self.block_size)}")
+        if offset:
+            query_string += f" offset {int(offset)}"
+        records = self.db.execute(query_string, params) or []
+        if before is not None:
+            records.reverse()
+        return records
+
+    @instrumented
+    def block(self, number):
+        """
+        Return the records of block number, reading it if needed.
+
+        """
+        if number in self.blocks:
+            self.blocks.move_to_end(number)
+            return self.blocks[number]
+        previous, following = self.blocks.get(number - 1), self.blocks.get(number + 1)
+        if previous:
+            records = self.select(after=previous[-1][0])
+        elif following:
+            records = self.select(before=following[0][0])
+        else:
+            records = self.select(offset=number * self.block_size)
+        self.blocks[number] = records
+        for i, (id, text) in enumerate(records):
+            self.idrows[id] = number * self.block_size + i
+        while len(self.blocks) > self.max_blocks:
+            _, dropped = self.blocks.popitem(last=False)
+            for id, text in dropped:
+                self.idrows.pop(id, None)
+        return records
+
+    def record(self, row):
+        """
+        Return the (id, text) record at row, None if it does not exist any more.
+
+        """
+        number, i = divmod(row, self.block_size)
+        records = self.block(number)
+        return records[i] if i < len(records) else None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.total
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole, Qt.UserRole):
+            return None
+        record = self.record(index.row())
+        if record is None:
+            return None
+        if role == Qt.UserRole:
+            return record[0]
+        return str(record[1])
+
+    @instrumented
+    def row(self, id_value):
+        """
+        Return the row of id_value, -1 if there is no such id.
+
+        """
+        if id_value not in self.idrows:
+            row = self.count(below=id_value)
+            record = self.record(row) if row < self.total else None
+            if record is None or record[0] != id_value:
+                return -1
+        return self.idrows[id_value]
+
+    def find(self, text, limit=1, exact=True, case_sensitive=True):
+        """
+        Return the ids of up to limit rows whose text equals text, or starts
+        with it if exact is False, in id order. One query, no rows are read into the model.
+
+        """
+        value = text if exact else text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        column = self.textcolumn
+        if not case_sensitive:
+            column, value = f"lower({column})", value.lower()
+        operator = "=" if exact else "like"
+        predicate = f"{column} {operator} {self.db.placeholder}" + ("" if exact else " escape '\\'")
+        condition, params = self.where([predicate], [value])
+        records = self.db.execute(f"select {self.idcolumn} from {self.table}{condition} "
+                                  f"order by {self.idcolumn} limit {int(limit)}", params)
+        return [id for id, in (records or [])]
+
+    def match(self, start, role, value, hits=1, flags=Qt.MatchFlags(int(Qt.MatchExactly) | int(Qt.MatchWrap))):
+        """
+        Find rows with a query instead of reading every row, as QAbstractItemModel.match
+        does. QComboBox.findText and findData, called on Return, end up here.
+        Text is matched exactly or as a prefix, ids through the id index.
+        Other match types find nothing. At most block_size rows are returned.
+
+        """
+        limit = self.block_size if hits < 0 else hits
+        matchtype = int(flags) & 0x0F
+        if role == Qt.UserRole:
+            ids = [value]
+        elif role in (Qt.DisplayRole, Qt.EditRole) and matchtype in (int(Qt.MatchExactly), int(Qt.MatchFixedString),
+                                                                        int(Qt.MatchStartsWith)):
+            case_sensitive = bool(int(flags) & int(Qt.MatchCaseSensitive)) or matchtype == int(Qt.MatchExactly)
+            ids = self.find(str(value), limit, matchtype != int(Qt.MatchStartsWith), case_sensitive)
+        else:
+            return []
+        rows = [self.row(id) for id in ids[:limit]]
+        return [self.index(row, 0) for row in rows if row >= 0]
+
+    def setText(self, id_value, text):
+        """
+        Change the text of id_value if its row is read.
+
+        """
+        row = self.idrows.get(id_value)
+        if row is None:
+            return
+        number, i = divmod(row, self.block_size)
+        self.blocks[number][i] = (id_value, text)
+        self.dataChanged.emit(self.createIndex(row, 0), self.createIndex(row, 0))
+
+
+class DBLookupComboBox(DBComboBox):
+    """
+    DBComboBox for large lookup tables. Items are kept in a LookupModel and
+    read from the database in blocks when they are shown, not all at once. Typing in the combobox runs a prefix query on textcolumn and offers
+    the matching items for completion. idcolumn must be the primary key of the table.
+
+    Attributes
+    ----------
+    parent : QWidget
+        Parent widget for the combobox
+
+    db : DB object
+        Database to connect to.
+
+    table : str
+        Name of the table
+
+    textcolumn : str
+        Name of the column to display
+
+    idcolumn : str
+        Primary key column to emit via signal as id.
+
+    default_id : Variable, optional
+        Value of idcolumn to set as selected record.
+
+    block_size : int, optional
+        Number of items read at a time. Default is 200
+
+    max_blocks : int, optional
+        Number of blocks of items kept in memory. Default is 64
+
+    completion_limit : int, optional
+        Maximum number of completions offered. Default is 50
+
+    completion_delay : int, optional
+        Milliseconds without typing before the completion query runs. Default is 150
+
+    """
+
+    def __init__(self, parent, db, tablename, textcolumn, idcolumn, default_id=None, block_size=200, max_blocks=64,
+                 completion_limit=50, completion_delay=150):
+        if db.tables[tablename].primaryKey() != [idcolumn]:
+            raise Exception(f"{idcolumn} is not the primary key of {tablename}, cannot use DBLookupComboBox.")
+        self.lookup = LookupModel(db, tablename, idcolumn, textcolumn, block_size, max_blocks)
+        self.completion_limit = completion_limit
+        self.completions = {}
+        super(DBLookupComboBox, self).__init__(parent, db, tablename, textcolumn, idcolumn, default_id)
+        self.setEditable(True)
+        self.setInsertPolicy(QComboBox.NoInsert)
+        self.completionModel = QStringListModel(self)
+        completer = QCompleter(self.completionModel, self)
+        completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        completer.activated[str].connect(self.completionChosen)
+        self.setCompleter(completer)
+        self.completionTimer = QTimer(self)
+        self.completionTimer.setSingleShot(True)
+        self.completionTimer.setInterval(completion_delay)
+        self.completionTimer.timeout.connect(self.complete)
+        self.lineEdit().textEdited.connect(lambda text: self.completionTimer.start())
+        self.lineEdit().returnPressed.connect(lambda: self.completionChosen(self.lineEdit().text()))
+
+    @instrumented
+    def fill(self):
+        """
+        Show the items of the whole table. Only the row count is read here.
+
+        """
+        self.query, self.params = self.dataquery, None
+        self.setCondition(None, ())
+
+    def setCondition(self, condition, params):
+        self.blockSignals(True)
+        if self.model() is not self.lookup:
+            # size the combobox without reading every item
+            self.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLengthWithIcon)
+            self.setMinimumContentsLength(20)
+            view = QListView(self)
+            view.setUniformItemSizes(True)
+            self.setView(view)
+            self.setModel(self.lookup)
+        self.lookup.setCondition(condition, params)
+        if self.lookup.rowCount() > 0:
+            # select the first item like DBComboBox, or default_id on the first fill
+            row = self.lookup.row(self.default_id) if self.default_id is not None else -1
+            self.setCurrentIndex(max(row, 0))
+        self.blockSignals(False)
+        self.idxChanged()
+
+    @instrumented
+    def refill(self, obj):
+        """
+        Show the items of the master id obj. Only the row count is read here.
+
+        """
+        self.query, self.params = self.detailquery, (obj,)
+        self.setCondition(f"{self.mastercolumn} = {self.db.placeholder}", (obj,))
+
+    def selectId(self, id_value):
+        """
+        Select the item with the given id, using the id index of the model.
+
+        """
+        if id_value is None:
+            return
+        row = self.lookup.row(id_value)
+        if row >= 0:
+            self.setCurrentIndex(row)
+
+    @instrumented
+    def complete(self):
+        """
+        Run the prefix query for the typed text and show the completions.
+
+        """
+        text = self.lineEdit().text()
+        if text == "":
+            return
+        prefix = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        predicates = [f"{self.textcolumn} like {self.db.placeholder} escape '\\'"]
+        params = [prefix]
+        if self.lookup.condition is not None:
+            predicates.append(f"({self.lookup.condition})")
+            params.extend(self.lookup.params)
+        records = self.db.execute(f"select {self.idcolumn}, {self.textcolumn} from {self.table} "
+                                  f"where {' and '.join(predicates)} order by {self.textcolumn} "
+                                  f"limit {int(self.completion_limit)}", params)
+        self.completions = {str(text): id for id, text in (records or [])}
+        self.completionModel.setStringList(list(self.completions.keys()))
+        self.completer().complete()
+
+    def completionChosen(self, text):
+        """
+        Select the item of text, chosen from the completions or typed and confirmed with Return.
+
+        """
+        id_value = self.completions.get(text)
+        if id_value is None:
+            ids = self.lookup.find(text)
+            id_value = ids[0] if ids else None
+        self.selectId(id_value)
+
+    @instrumented
+    def applyChange(self, event):
+        """
+        Update the item of the row changed in event. Inserted and deleted rows reset the model.
+
+        """
+        id_value = event.key[0]
+        records = []
+        if event.op != "DELETE":
+            records = self.db.execute(f"select * from ({self.query}) dbwidgets_row where {self.idcolumn} = {self.db.placeholder}",
+                                      tuple(self.params or ()) + (id_value,))
+        if event.op == "UPDATE" and records is not None and len(records) > 0:
+            self.lookup.setText(records[0][0], records[0][1])
+            return
+        # rows moved, count again and select the same id
+        selected = self.selected_id
+        self.blockSignals(True)
+        self.lookup.refresh()
+        self.selectId(selected)
+        self.blockSignals(False)
+        if self.itemData(self.currentIndex()) != selected:
+            self.idxChanged()
+
+
+class DBNavigatorWidget(QWidget):
+    """
+    DBNavigatorWidget will provide a compound widget to display/edit/delete
+    individual rows from tables.
+
+    The whole table is never loaded. Every move is one query on the primary key,
+    see KeysetPager: first and last read one row from either end of the index,
+    next and previous read the row after or before the current key. The records
+    around the current one are prefetched on a thread pool, so moving through
+    them does not wait for the database.
+
+    Attributes
+    ----------
+    parent : QWidget
+        Parent widget for the navigator
+
+    db : DB object
+        Database to connect to.
+
+    tablename : str
+        Name of the table
+
+    prefetch : int, optional
+        Number of records read ahead in the direction of movement. Default is 32
+
+    threadpool : QThreadPool, optional
+        Thread pool for the prefetch queries. Default is QThreadPool.globalInstance()
+
+    window : list
+        Records read so far around the current record, in primary key order.
+
+    position : int or None
+        Index of the current record in window, None for an empty table.
+
+    selected_id : Variable
+        Primary key of the current record, a tuple for composite keys.
+
+    edits : EditBuffer
+        Edited fields waiting for the Ok button.
+
+    """
+
+    signalMasterId = Signal(object)
+    signalRowChanged = Signal(object)
+    signalLoading = Signal(bool)
+    signalConflict = Signal(object, object)
+    signalAccept = Signal()
+    signalCancel = Signal()
+
+    def __init__(self, parent, db, tablename, prefetch=32, threadpool=None):
+        super(DBNavigatorWidget, self).__init__(parent)
+        self.db = db
+        self.tablename = tablename
+        self.table = tablename
+        self.columns = list(self.db.tables[self.table].columns.keys())
+        self.pager = KeysetPager(db, tablename, page_size=1)
+        self.prefetch = prefetch
+        self.window = []
+        self.position = None
+        self.at_start = False
+        self.at_end = False
+        self.selected_id = None
+        self.edits = EditBuffer(db, tablename)
+        self.loader = BackgroundLoader(self, self.prefetched, threadpool)
+        self.setupUi(self)
+        self.DBNavFirst()
+        self.show()
+
+    def setupUi(self, DBNavigatorWidget):
+        if DBNavigatorWidget.objectName():
+            DBNavigatorWidget.setObjectName(u"DBNavigatorWidget")
+
+        self.verticalLayout = QVBoxLayout(DBNavigatorWidget)
+        self.verticalLayout.setObjectName(u"verticalLayout")
+        self.dbeditWidget = QWidget(DBNavigatorWidget)
+        self.dbeditWidget.setObjectName(u"dbeditWidget")
+        sizePolicy = QSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.dbeditWidget.sizePolicy().hasHeightForWidth())
+        self.dbeditWidget.setSizePolicy(sizePolicy)
+        self.formLayout = QFormLayout(self.dbeditWidget)
+        self.fields = {}
+        for column in self.columns:
+            field = QLineEdit(self.dbeditWidget)
+            field.setObjectName(f"field_{column}")
+            field.textEdited.connect(lambda text, column=column: self.fieldEdited(column, text))
+            self.formLayout.addRow(column, field)
+            self.fields[column] = field
+        self.verticalLayout.addWidget(self.dbeditWidget)
+        self.horizontalLayout = QHBoxLayout()
+        self.horizontalLayout.setObjectName(u"horizontalLayout")
+        self.horizontalLayout.setSizeConstraint(QLayout.SetMinimumSize)
+        self.btnDBNavFirst = QPushButton(DBNavigatorWidget)
+        self.btnDBNavFirst.setObjectName(u"btnDBNavFirst")
+        self.horizontalLayout.addWidget(self.btnDBNavFirst)
+        self.btnDBNavPrev = QPushButton(DBNavigatorWidget)
+        self.btnDBNavPrev.setObjectName(u"btnDBNavPrev")
+        self.horizontalLayout.addWidget(self.btnDBNavPrev)
+        self.btnDBNavNext = QPushButton(DBNavigatorWidget)
+        self.btnDBNavNext.setObjectName(u"btnDBNavNext")
+        self.horizontalLayout.addWidget(self.btnDBNavNext)
+        self.btnDBNavLast = QPushButton(DBNavigatorWidget)
+        self.btnDBNavLast.setObjectName(u"btnDBNavLast")
+        self.horizontalLayout.addWidget(self.btnDBNavLast)
+        self.btnDBNavAdd = QPushButton(DBNavigatorWidget)
+        self.btnDBNavAdd.setObjectName(u"btnDBNavAdd")
+        self.horizontalLayout.addWidget(self.btnDBNavAdd)
+        self.btnDBNavDelete = QPushButton(DBNavigatorWidget)
+        self.btnDBNavDelete.setObjectName(u"btnDBNavDelete")
+        self.horizontalLayout.addWidget(self.btnDBNavDelete)
+        self.btnDBNavAccept = QPushButton(DBNavigatorWidget)
+        self.btnDBNavAccept.setObjectName(u"btnDBNavAccept")
+        self.horizontalLayout.addWidget(self.btnDBNavAccept)
+        self.btnDBNavCancel = QPushButton(DBNavigatorWidget)
+        self.btnDBNavCancel.setObjectName(u"btnDBNavCancel")
+        self.horizontalLayout.addWidget(self.btnDBNavCancel)
+        self.verticalLayout.addLayout(self.horizontalLayout)
+        self.retranslateUi(DBNavigatorWidget)
+        self.btnDBNavFirst.clicked.connect(DBNavigatorWidget.DBNavFirst)
+        self.btnDBNavPrev.clicked.connect(DBNavigatorWidget.DBNavPrev)
+        self.btnDBNavNext.clicked.connect(DBNavigatorWidget.DBNavNext)
+        self.btnDBNavLast.clicked.connect(DBNavigatorWidget.DBNavLast)
+        self.btnDBNavAdd.clicked.connect(DBNavigatorWidget.DBNavNew)
+        self.btnDBNavDelete.clicked.connect(DBNavigatorWidget.DBNavDelete)
+        self.btnDBNavAccept.clicked.connect(DBNavigatorWidget.DBNavAccept)
+        self.btnDBNavCancel.clicked.connect(DBNavigatorWidget.DBNavCancel)
+        # holding the button keeps moving
+        self.btnDBNavPrev.setAutoRepeat(True)
+        self.btnDBNavNext.setAutoRepeat(True)
+        QMetaObject.connectSlotsByName(DBNavigatorWidget)
+    # setupUi
+
+    def retranslateUi(self, DBNavigatorWidget):
+        DBNavigatorWidget.setWindowTitle(QCoreApplication.translate("DBNavigatorWidget", u"Form", None))
+        self.btnDBNavFirst.setText(QCoreApplication.translate("DBNavigatorWidget", u"<<", None))
+        self.btnDBNavPrev.setText(QCoreApplication.translate("DBNavigatorWidget", u"<", None))
+        self.btnDBNavNext.setText(QCoreApplication.translate("DBNavigatorWidget", u">", None))
+        self.btnDBNavLast.setText(QCoreApplication.translate("DBNavigatorWidget", u">>", None))
+        self.btnDBNavAdd.setText(QCoreApplication.translate("DBNavigatorWidget", u"+", None))
+        self.btnDBNavDelete.setText(QCoreApplication.translate("DBNavigatorWidget", u"-", None))
+        self.btnDBNavAccept.setText(QCoreApplication.translate("DBNavigatorWidget", u"Ok", None))
+        self.btnDBNavCancel.setText(QCoreApplication.translate("DBNavigatorWidget", u"Cancel", None))
+    # retranslateUi
+
+    def setLoading(self, loading):
+        """
+        Prefetching does not block the navigator, only signalLoading is emitted.
+
+        """
+        self.signalLoading.emit(loading)
+
+    def currentRecord(self):
+        """
+        Return the current record, None if the table is empty.
+
+        """
+        if self.position is None:
+            return None
+        return self.window[self.position]
+
+    def setRecord(self):
+        """
+        Show the current record in the fields and emit its primary key.
+
+        """
+        record = self.currentRecord()
+        changes = {} if record is None else self.edits.pending.get(self.pager.key(record), {})
+        for i, column in enumerate(self.columns):
+            value = None if record is None else changes.get(column, record[i])
+            self.fields[column].setText("" if value is None else str(value))
+        if record is None:
+            self.selected_id = None
+            return
+        key = self.pager.key(record)
+        self.selected_id = key[0] if len(key) == 1 else key
+        self.signalRowChanged.emit(self.selected_id)
+        self.signalMasterId.emit(self.selected_id)
+
+    def jump(self, records, at_start, at_end):
+        # start a new window at one end of the table
+        self.loader.cancel()
+        self.window = list(records)
+        self.position = 0 if len(self.window) > 0 else None
+        self.at_start = at_start
+        self.at_end = at_end or len(self.window) == 0
+        self.setRecord()
+        self.prefetchAround()
+
+    @instrumented
+    def DBNavFirst(self):
+        """
+        Move to the record with the smallest primary key.
+
+        """
+        self.jump(self.pager.first(), True, False)
+
+    @instrumented
+    def DBNavPrev(self):
+        """
+        Move to the record before the current one.
+
+        """
+        if self.position is None:
+            return
+        if self.position > 0:
+            self.position -= 1
+        else:
+            if self.at_start:
+                return
+            records = self.pager.before(self.pager.key(self.window[0]))
+            if len(records) == 0:
+                self.at_start = True
+                return
+            self.window.insert(0, records[-1])
+        self.setRecord()
+        self.prefetchAround()
+
+    @instrumented
+    def DBNavLast(self):
+        """
+        Move to the record with the largest primary key.
+
+        """
+        self.jump(self.pager.last(), False, True)
+
+    @instrumented
+    def DBNavNext(self):
+        """
+        Move to the record after the current one.
+
+        """
+        if self.position is None:
+            return
+        if self.position + 1 < len(self.window):
+            self.position += 1
+        else:
+            if self.at_end:
+                return
+            records = self.pager.after(self.pager.key(self.window[-1]))
+            if len(records) == 0:
+                self.at_end = True
+                return
+            self.window.append(records[0])
+            self.position += 1
+        self.setRecord()
+        self.prefetchAround()
+
+    @instrumented
+    def prefetchAround(self):
+        """
+        Start reading the next records in the background when fewer than half
+        of prefetch records are left before either end of the window.
+
+        """
+        if self.position is None or self.loader.isLoading():
+            return
+        ahead = len(self.window) - 1 - self.position
+        if ahead < self.prefetch // 2 and not self.at_end:
+            key = self.pager.key(self.window[-1])
+            query_string, params = self.pager.statement(key, ">", False, self.prefetch)
+            self.loader.load(query_string, params, key=(">", key))
+        elif self.position < self.prefetch // 2 and not self.at_start:
+            key = self.pager.key(self.window[0])
+            query_string, params = self.pager.statement(key, "<", True, self.prefetch)
+            self.loader.load(query_string, params, key=("<", key))
+
+    def prefetched(self, key, records):
+        """
+        Add the prefetched records to the window, if it still ends with the key they were read from.
+
+        """
+        if records is None or self.position is None:
+            return
+        operator, fromkey = key
+        if operator == ">":
+            if self.pager.key(self.window[-1]) != fromkey:
+                return
+            self.window.extend(records)
+            self.at_end = len(records) < self.prefetch
+        else:
+            if self.pager.key(self.window[0]) != fromkey:
+                return
+            records = list(reversed(records))
+            self.window[0:0] = records
+            self.position += len(records)
+            self.at_start = len(records) < self.prefetch
+        # keep a few prefetch blocks on each side of the current record
+        limit = 2 * self.prefetch
+        if self.position > limit:
+            del self.window[:self.position - limit]
+            self.position = limit
+            self.at_start = False
+        if len(self.window) - 1 - self.position > limit:
+            del self.window[self.position + limit + 1:]
+            self.at_end = False
+        QTimer.singleShot(0, self.prefetchAround)
+
+    def DBNavNew(self):
+        pass
+
+    def DBNavDelete(self):
+        pass
+
+    def fieldEdited(self, column, text):
+        """
+        Keep the edited field in self.edits until the Ok button is clicked.
+
+        """
+        record = self.currentRecord()
+        if record is None:
+            return
+        try:
+            value = self.db.tables[self.table].columns[column].convert(text)
+        except ValueError:
+            # incomplete input, written when it becomes valid
+            return
+        self.edits.set(self.pager.key(record), record, column, value)
+
+    @instrumented
+    def DBNavAccept(self):
+        """
+        Write the edited fields of all records in one transaction and emit signalAccept.
+        Conflicting records are reported with signalConflict, see EditBuffer.flush.
+
+        """
+        try:
+            written, conflicts = self.edits.flush()
+        except:
+            tb.print_exc()
+            print("Cannot write changes to ", self.table)
+            return
+        for i, record in enumerate(self.window):
+            key = self.pager.key(record)
+            if key in written:
+                self.window[i] = written[key]
+            elif conflicts.get(key) is not None:
+                self.window[i] = conflicts[key]
+        if len(conflicts) > 0:
+            # the edits of conflicting records are dropped, show the current values
+            self.setRecord()
+        for key, record in conflicts.items():
+            self.signalConflict.emit(key, record)
+        self.signalAccept.emit()
+
+    def reapply(self, key):
+        """
+        Make the edits of a record rejected by DBNavAccept as a conflict pending
+        again, over the values now in the database. They are written by the
+        next DBNavAccept unless the record changed again.
+
+        """
+        if len(self.edits.reapply(key)) > 0:
+            self.setRecord()
+
+    def DBNavCancel(self):
+        """
+        Drop the edits that are not written, show the current record as read and emit signalCancel.
+
+        """
+        self.edits.discard()
+        self.setRecord()
+        self.signalCancel.emit()
+
+
+
+class FilterHeader(QHeaderView):
+    """
+    Horizontal header with a row of line edits under the section labels, one
+    per column, used as the filter row of DBTableWidget.
+
+    signalFilterEdited emits the column number and the text when a line edit is edited.
+
+    """
+    signalFilterEdited = Signal(int, str)
+
+    def __init__(self, parent):
+        super(FilterHeader, self).__init__(Qt.Horizontal, parent)
+        self.editors = []
+        self.setSectionsClickable(True)
+        self.sectionResized.connect(self.placeEditors)
+        parent.horizontalScrollBar().valueChanged.connect(self.placeEditors)
+
+    def setFilterBoxes(self, count):
+        """
+        Show count line edits, none if count is 0.
+
+        """
+        for editor in self.editors:
+            editor.deleteLater()
+        self.editors = []
+        for column in range(count):
+            editor = QLineEdit(self)
+            editor.textEdited.connect(lambda text, column=column: self.signalFilterEdited.emit(column, text))
+            editor.show()
+            self.editors.append(editor)
+        self.updateGeometries()
+        self.placeEditors()
+
+    def filterText(self, column):
+        return self.editors[column].text()
+
+    def setFilterText(self, column, text):
+        self.editors[column].setText(text)
+
+    def sizeHint(self):
+        size = super(FilterHeader, self).sizeHint()
+        if self.editors:
+            size.setHeight(size.height() + self.editors[0].sizeHint().height())
+        return size
+
+    def updateGeometries(self):
+        # the labels are drawn in the viewport, the editors go under it
+        height = self.editors[0].sizeHint().height() if self.editors else 0
+        self.setViewportMargins(0, 0, 0, height)
+        super(FilterHeader, self).updateGeometries()
+        self.placeEditors()
+
+    def placeEditors(self):
+        top = super(FilterHeader, self).sizeHint().height()
+        for column, editor in enumerate(self.editors):
+            editor.setGeometry(self.sectionViewportPosition(column), top,
+                               self.sectionSize(column), editor.sizeHint().height())
+            editor.setVisible(not self.isSectionHidden(column))
+
+
+class DBTableWidget(QTableWidget):
+    """
+    DBTableWidget provides a QTableWidget with a table.
+
+    Attributes
+    ----------
+
+    parent : QWidget
+        The parent widget on user interface to put the DBTableWidget on.
+
+    db : DB object
+        Database to connect to
+
+    table : str
+        Name of the table to display on DBTableWidget
+
+    dataquery : str
+        Default SQL query to fill the DBTableWidget. Foreign key columns with a
+        join column, see Column.setJoinColumn, are joined to their tables in
+        this query and show the join column instead of the id.
+
+    current_id : Variable
+        The selected row's primary key value
+
+    records : list
+        Records displayed on the table, as read from the database. The values
+        of the join columns follow the table columns.
+
+    joins : dict
+        Position of the joined display value in a record, by foreign key column name.
+
+    sort_column : str or None
+        Column the rows are ordered by in the query, see sortBy.
+
+    filters : dict
+        Predicate, values and text of the filter of each filtered column, see setFilter.
+
+    edits : EditBuffer or None
+        Edited cells waiting for flush, None if the table has no primary key.
+
+    background : bool, optional
+        Run the queries on a thread pool instead of the GUI thread. See setBackgroundLoading.
+
+    """
+    signalCellChange = Signal(object)
+    signalMasterId = Signal(object)
+    signalRowChanged = Signal(object)
+    signalLoading = Signal(bool)
+    signalConflict = Signal(object, object)
+
+    def __init__(self, parent,  db, tablename, default_id = None, background=False):
+        super(DBTableWidget,self).__init__(parent)
+        sizePolicy = QSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setSizePolicy(sizePolicy)
+        self.current_row = None
+        self.selected_id = None
+        self.db = db
+        self.setFixedWidth(parent.width())
+        self.table = tablename
+        self.columns = list(self.db.tables[self.table].columns.keys())
+        self.buildQuery()
+        self.detailquery = None
+        self.link = None
+        self.loader = None
+        self.records = []
+        self.query = self.dataquery
+        self.params = None
+        self.master_value = None
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+        self.filters = {}
+        self.clear()
+        self.current_id = None
+        self.keyindex = [self.columns.index(k) for k in self.db.tables[self.table].primaryKey()] or [0]
+        self.edits = None
+        if len(self.db.tables[self.table].primaryKey()) > 0:
+            self.edits = EditBuffer(self.db, self.table)
+        self.flushtimer = QTimer(self)
+        self.flushtimer.setSingleShot(True)
+        self.flushtimer.timeout.connect(self.flush)
+        self.auto_flush = 0
+        self.filtertimer = QTimer(self)
+        self.filtertimer.setSingleShot(True)
+        self.filtertimer.timeout.connect(self.applyFilterRow)
+        self.filter_delay = 300
+
+        self.setHorizontalHeader(FilterHeader(self))
+        self.horizontalHeader().sectionClicked.connect(self.headerClicked)
+        self.horizontalHeader().signalFilterEdited.connect(self.filterEdited)
+        self.setColumnCount(len(self.db.tables[self.table].columns.keys()))
+        self.setHorizontalHeaderLabels(list(self.db.tables[self.table].columns.keys()))
+        self.cellClicked.connect(self.check_row)
+        self.cellChanged.connect(self.cellEdited)
+        if background:
+            self.setBackgroundLoading(True)
+        self.fill()
+
+    def buildQuery(self):
+        """
+        Build self.dataquery from the column definitions. Each foreign key
+        column with a join column is joined to its table, INNER JOIN or LEFT
+        JOIN by its join_type, so the display values of all rows come with the
+        same query. Columns are qualified with their table names.
+
+        """
+        table = self.db.tables[self.table]
+        select = [f"{self.table}.{name}" for name in self.columns]
+        joins = []
+        self.joins = {}
+        self.headers = list(self.columns)
+        for col in table.columns.values():
+            if col.foreign_key_join_column is None:
+                continue
+            alias = f"dbwidgets_{col.name}"
+            join = "left join" if (col.join_type or "").upper() in ("OUTER", "LEFT", "LEFT OUTER") else "join"
+            joins.append(f"{join} {col.foreign_key_table} {alias} "
+                         f"on {alias}.{col.foreign_key_column} = {self.table}.{col.name}")
+            self.joins[col.name] = len(select)
+            self.headers.append(f"{col.name}__{col.foreign_key_join_column}")
+            select.append(f"{alias}.{col.foreign_key_join_column} as {self.headers[-1]}")
+        self.selectlist = ", ".join(select)
+        self.fromclause = " ".join([self.table] + joins)
+        self.dataquery = f"select {self.selectlist} from {self.fromclause}"
+
+    def columnExpression(self, name):
+        """
+        Return the SQL expression of the values shown in column name, and its
+        Column. For a joined foreign key column that is the join column of the referenced table.
+
+        """
+        col = self.db.tables[self.table].columns[name]
+        if name in self.joins:
+            joined = self.db.tables[col.foreign_key_table].columns[col.foreign_key_join_column]
+            return f"dbwidgets_{name}.{col.foreign_key_join_column}", joined
+        return f"{self.table}.{name}", col
+
+    def selectQuery(self, master=False):
+        """
+        Return the query of the table and its parameters, with the master
+        condition if master is True, the filters in the where clause and the sort column in order by.
+
+        """
+        conditions = []
+        params = []
+        if master:
+            conditions.append(f"{self.table}.{self.mastercolumn} = {self.db.placeholder}")
+            params.append(self.master_value)
+        for predicate, values, text in self.filters.values():
+            conditions.append(predicate)
+            params.extend(values)
+        query = self.dataquery
+        if len(conditions) > 0:
+            query += " where " + " and ".join(conditions)
+        if self.sort_column is not None:
+            expression, col = self.columnExpression(self.sort_column)
+            direction = "desc" if self.sort_order == Qt.DescendingOrder else "asc"
+            order = [f"{expression} {direction}"]
+            # ties in primary key order, so the rows keep their places between queries
+            order.extend(f"{self.table}.{k}" for k in self.db.tables[self.table].primaryKey() if k != self.sort_column)
+            query += " order by " + ", ".join(order)
+        return query, (tuple(params) if len(params) > 0 else None)
+
+    def isPlainQuery(self):
+        # plain master queries are the ones kept by the detail cache
+        return len(self.filters) == 0 and self.sort_column is None
+
+    def reload(self):
+        """
+        Run the query again from scratch, after the sort order or the filters are changed.
+
+        """
+        if self.detailquery is not None:
+            self.refill(self.master_value)
+        else:
+            self.fill()
+
+    def sortBy(self, name, order=Qt.AscendingOrder):
+        """
+        Order the rows by column name in the query, so the database sorts them
+        and can use its indexes. Joined foreign key columns are ordered by the
+        value shown. None returns to the order of the database.
+
+        Parameters
+        ----------
+
+        name : str or None
+            Column name.
+
+        order : Qt.SortOrder, optional
+            Qt.AscendingOrder or Qt.DescendingOrder. Default is Qt.AscendingOrder
+
+        """
+        if name is not None and name not in self.columns:
+            raise Exception(f"Column {name} not found in {self.table}")
+        self.sort_column = name
+        self.sort_order = order
+        header = self.horizontalHeader()
+        header.setSortIndicatorShown(name is not None)
+        if name is not None:
+            header.setSortIndicator(self.columns.index(name), order)
+        self.reload()
+
+    def headerClicked(self, column):
+        """
+        Sort by the clicked column, reversing the order on the second click.
+
+        This method is invoked via sectionClicked signal of the header. It is not expected to call it from application.
+
+        """
+        name = self.columns[column]
+        order = Qt.AscendingOrder
+        if name == self.sort_column and self.sort_order == Qt.AscendingOrder:
+            order = Qt.DescendingOrder
+        self.sortBy(name, order)
+
+    def filterPredicate(self, name, text):
+        """
+        Return the where clause predicate and its values for filter text on column name.
+
+        Text starting with =, !=, <>, <, <=, > or >= compares the column with the
+        rest of the text. Otherwise text columns match values starting with the
+        text, other columns values equal to it. Raises ValueError if the value is
+        not valid for the column type, see Column.convert. Columns of types
+        convert cannot check are compared as text.
+
+        """
+        expression, col = self.columnExpression(name)
+        datatype = (col.datatype or "").lower()
+        textual = "char" in datatype or "text" in datatype or datatype == ""
+        match = re.match(r"\s*(<>|!=|<=|>=|=|<|>)\s*(.*)$", text)
+        operator, value = ("=", text.strip()) if match is None else match.groups()
+        value = col.convert(value)
+        if value is None:
+            return f"{expression} {'is not' if operator in ('!=', '<>') else 'is'} null", ()
+        if isinstance(value, str) and not textual and not any(
+                t in datatype for t in ("date", "time", "uuid", "inet", "cidr", "json")):
+            # convert cannot check values of this type, compare them as text so
+            # a value the database cannot parse matches nothing instead of failing the query
+            expression = f"cast({expression} as varchar)"
+            textual = True
+        if match is None and textual:
+            prefix = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            return f"{expression} like {self.db.placeholder} escape '\\'", (prefix,)
+        return f"{expression} {operator} {self.db.placeholder}", (value,)
+
+    def setFilter(self, name, text, reload=True):
+        """
+        Show only the rows matching text in column name, see filterPredicate.
+        The filter is a parameterized predicate in the where clause of the
+        query, together with the master condition. Empty text removes the filter.
+
+        Raises ValueError if text is not valid for the column type.
+
+        Parameters
+        ----------
+
+        name : str
+            Column name.
+
+        text : str
+            Filter text.
+
+        reload : bool, optional
+            Run the query again. Default is True
+
+        """
+        if name not in self.columns:
+            raise Exception(f"Column {name} not found in {self.table}")
+        if text.strip() == "":
+            self.filters.pop(name, None)
+        else:
+            predicate, values = self.filterPredicate(name, text)
+            self.filters[name] = (predicate, values, text)
+        header = self.horizontalHeader()
+        if header.editors and header.filterText(self.columns.index(name)) != text:
+            header.setFilterText(self.columns.index(name), text)
+        if reload:
+            self.reload()
+
+    def clearFilters(self):
+        """
+        Remove all filters and show every row again.
+
+        """
+        for name in list(self.filters):
+            self.setFilter(name, "", reload=False)
+        self.reload()
+
+    def setFilterRow(self, enabled=True, delay=300):
+        """
+        Show a line edit under each column header. The text typed is applied
+        with setFilter, delay milliseconds after the last key press.
+
+        Parameters
+        ----------
+
+        enabled : bool, optional
+            Show the filter row if True, hide it if False. Default is True
+
+        delay : int, optional
+            Milliseconds to wait after typing. Default is 300
+
+        """
+        self.filter_delay = delay
+        header = self.horizontalHeader()
+        header.setFilterBoxes(len(self.columns) if enabled else 0)
+        if enabled:
+            for name, (predicate, values, text) in self.filters.items():
+                header.setFilterText(self.columns.index(name), text)
+        self.updateGeometries()
+
+    def filterEdited(self, column, text):
+        self.filtertimer.start(self.filter_delay)
+
+    def applyFilterRow(self):
+        """
+        Apply the texts of the filter row, leaving out the ones that are not valid for their columns.
+
+        This method is invoked via the timer of the filter row. It is not expected to call it from application.
+
+        """
+        header = self.horizontalHeader()
+        changed = False
+        for column, name in enumerate(self.columns):
+            text = header.filterText(column)
+            current = self.filters[name][2] if name in self.filters else ""
+            if text == current:
+                continue
+            try:
+                self.setFilter(name, text, reload=False)
+                header.editors[column].setToolTip("")
+                changed = True
+            except ValueError as e:
+                header.editors[column].setToolTip(str(e))
+        if changed:
+            self.reload()
+
+    def cellItem(self, record, column):
+        """
+        Return the item for a column of record. A joined foreign key column
+        shows the display value, keeps the id as Qt.UserRole data and is not editable.
+
+        """
+        value = record[column]
+        name = self.columns[column]
+        if name not in self.joins:
+            return QTableWidgetItem(str(value))
+        item = QTableWidgetItem(str(record[self.joins[name]]))
+        item.setData(Qt.UserRole, value)
+        item.setFlags(Qt.ItemFlags(int(item.flags()) & ~int(Qt.ItemIsEditable)))
+        return item
+
+    def setCells(self, row, record, old=()):
+        # set the items of row that differ from the old record
+        for j, name in enumerate(self.columns):
+            changed = j >= len(old) or old[j] != record[j]
+            if name in self.joins and not changed:
+                changed = old[self.joins[name]] != record[self.joins[name]]
+            if changed:
+                self.setItem(row, j, self.cellItem(record, j))
+
+    def setBackgroundLoading(self, enabled=True, threadpool=None):
+        """
+        Run fill and refill queries on a thread pool. The table is disabled and
+        signalLoading emits True while a query runs. If a new master id arrives
+        before the previous query finishes, the previous query is cancelled.
+
+        Parameters
+        ----------
+
+        enabled : bool
+            Load in background if True, on the GUI thread if False.
+
+        threadpool : QThreadPool, optional
+            Thread pool for the queries. Default is QThreadPool.globalInstance()
+
+        """
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader.deleteLater()
+            self.loader = None
+        if enabled:
+            self.loader = BackgroundLoader(self, self.loaded, threadpool)
+
+    def setLoading(self, loading):
+        """
+        Show the loading state while a background query runs.
+
+        """
+        self.setEnabled(not loading)
+        if loading:
+            self.setCursor(Qt.BusyCursor)
+        else:
+            self.unsetCursor()
+        self.signalLoading.emit(loading)
+
+    def load(self, query_string, params=None, key=None):
+        """
+        Run query_string and put its records into the table, in background if enabled.
+        key is the master id for detail queries, None otherwise.
+
+        """
+        if key is not None and self.link is not None:
+            # the version before the query, see MasterLink.store
+            key = (key, self.link.version())
+        if self.loader is not None:
+            self.loader.load(query_string, params, key)
+        else:
+            self.loaded(key, self.db.execute(query_string, params))
+
+    def loaded(self, key, records):
+        """
+        Put the records of a finished load into the table, caching detail
+        records by master id. key is the master id and the table version, see load.
+
+        """
+        if key is not None and self.link is not None:
+            self.link.store(key[0], records, key[1])
+        self.setRows(records)
+
+    @instrumented
+    def fill(self):
+        """
+        Fills the table with all rows of the table, filtered and sorted if filters or a sort column are set.
+
+        """
+        self.query, self.params = self.selectQuery()
+        self.load(self.query, self.params)
+
+    @instrumented
+    def refresh(self):
+        """
+        Run the current query again and update the table with the differences
+        only. Rows are matched by primary key: deleted rows are removed, new rows
+        are inserted and changed cells are updated. The other items, the
+        selection and the scroll position are kept.
+
+        """
+        version = self.link.version() if self.link is not None else None
+        if self.loader is not None:
+            self.loader.load(self.query, self.params, version, apply=self.refreshed)
+        else:
+            self.refreshed(version, self.db.execute(self.query, self.params))
+
+    def refreshed(self, version, records):
+        if self.params is not None and self.link is not None and self.isPlainQuery():
+            self.link.store(self.params[0], records, version)
+        self.applyRows(records)
+
+    def recordKey(self, record):
+        return tuple(record[i] for i in self.keyindex)
+
+    def applyRows(self, records):
+        """
+        Update the table to show records, changing only the rows that differ
+        from self.records. Falls back to setRows if the rows kept are not in the
+        same order as before.
+
+        """
+        if records is None:
+            return
+        newkeys = [self.recordKey(r) for r in records]
+        newset = set(newkeys)
+        oldkeys = [self.recordKey(r) for r in self.records]
+        oldset = set(oldkeys)
+        kept_old = [k for k in oldkeys if k in newset]
+        kept_new = [k for k in newkeys if k in oldset]
+        if len(newset) != len(newkeys) or len(oldset) != len(oldkeys) or kept_old != kept_new:
+            self.setRows(records)
+            return
+        scroll = self.verticalScrollBar().value()
+        self.blockSignals(True)
+        # remove deleted rows bottom up, so the row numbers above stay valid
+        for row in range(len(oldkeys) - 1, -1, -1):
+            if oldkeys[row] not in newset:
+                self.removeRow(row)
+        current = [r for r in self.records if self.recordKey(r) in newset]
+        for i, record in enumerate(records):
+            if i < len(current) and self.recordKey(current[i]) == newkeys[i]:
+                self.setCells(i, record, current[i])
+            else:
+                self.insertRow(i)
+                current.insert(i, record)
+                self.setCells(i, record)
+        self.records = list(records)
+        self.blockSignals(False)
+        self.verticalScrollBar().setValue(scroll)
+        if self.selected_id is not None:
+            for row, key in enumerate(newkeys):
+                if key[0] == self.selected_id:
+                    self.current_row = row
+                    break
+
+    def watchChanges(self, interval=500):
+        """
+        Keep the table current with the changes made to the table by other
+        connections and processes, see DB.changeFeed. Only the changed rows are
+        updated, deleted rows are removed and new rows are appended.
+
+        Parameters
+        ----------
+
+        interval : int, optional
+            Polling interval in milliseconds for databases without notifications. Default is 500
+
+        """
+        watchChanges(self, interval)
+
+    @instrumented
+    def applyChange(self, event):
+        """
+        Update the row changed in event. The row is read again with the current
+        query, so a detail table drops a row moved to another master and picks up a row moved in.
 
-    table : str
-        Name of the table
+        """
+        row = -1
+        for i, record in enumerate(self.records):
+            if sameKey(self.recordKey(record), event.key):
+                row = i
+                break
+        records = []
+        if event.op != "DELETE":
+            keycolumns = self.db.tables[self.table].primaryKey()
+            # the subquery keeps the bare column names, no need to qualify them
+            condition = " and ".join(f"{k} = {self.db.placeholder}" for k in keycolumns)
+            records = self.db.execute(f"select * from ({self.query}) dbwidgets_row where {condition}",
+                                      tuple(self.params or ()) + tuple(event.key))
+        self.blockSignals(True)
+        if records is not None and len(records) > 0:
+            record = records[0]
+            if row < 0:
+                row = len(self.records)
+                self.insertRow(row)
+                self.records.append(record)
+                old = ()
+            else:
+                old = self.records[row]
+                self.records[row] = record
+            self.setCells(row, record, old)
+        elif row >= 0:
+            self.removeRow(row)
+            del self.records[row]
+            if self.current_row == row:
+                self.current_row = None
+            elif self.current_row is not None and self.current_row > row:
+                self.current_row -= 1
+        self.blockSignals(False)
+
+    def setRows(self, records):
+        """
+        Replace the rows of the table with records.
 
-    textcolumn : str
-        Name of the column to display
+        """
+        if records is None:
+            records = []
+        self.records = list(records)
+        self.blockSignals(True)
+        self.clearContents()
+        self.setRowCount(len(records))
+        for i, record in enumerate(records):
+            self.setCells(i, record)
+        self.blockSignals(False)
+        if self.selected_id is None and len(records) > 0:
+            self.selected_id = records[0][0]
+            self.current_row = 0
+            if self.loader is not None:
+                # loaded after the detail widgets were connected, let them follow
+                self.signalRowChanged.emit(self.selected_id)
 
-    idcolumn : str
-        Name of the column to emit via signal as id.
+    def check_row(self, x, y):
+        """
+        Check if the selected row is changed.
+        Set selected_id attribute to that row's primary key value
 
-    default_id : Variable, optional
-        Value of idcolumn to set as selected record.
+        This method is invoked via cellClicked signal. It is not expected to call it from application.
 
-    Returns
-    -------
-    DBComboBox : dbwidgets.DBComboBox
-        DBComboBox widget
+        """
+        if x != self.current_row:
+            self.selected_id = self.recordKey(self.records[x])[0]
+            self.current_row = x
+            self.signalRowChanged.emit(self.selected_id)
 
-    """
 
-    signalMasterId = Signal(object)
-    def __init__(self, parent,  db, tablename, textcolumn, idcolumn, default_id = None):
-        super(DBComboBox, self).__init__(parent)
-        self.table = tablename
-        self.db = db
-        self.textcolumn = textcolumn
-        self.idcolumn = idcolumn
-        self.mastercolumn = None                
-        self.dataquery = f"select {idcolumn}, {textcolumn} from {self.table}"
-        self.fill()
-        self.selected_id = None
-        self.currentIndexChanged.connect(self.idxChanged)
-
-        if default_id is not None:
-            i = 0
-            found = False
-            while ((i <= self.count()) or (found == False)):
-                if self.itemData(i) == default_id:
-                    found = True
-                    self.setCurrentIndex(i)
-                i+=1
-                
+    @instrumented
     def refill(self,obj):
         """
-        Reset the contents of the combobox filtering with obj, which send by another widget.
+        If a master widget is defined for this widget, change the contents of the DBTableWidget using
+        the foreign key from master widget.
 
-        :param obj: Emitted via another widget
+        Parameters
+        ----------
+
+        obj : Variable
+            Foreign key value emitted from master widget.
 
         """
-        self.clear()
-        values = self.db.execute(self.dataquery + f" where {self.mastercolumn} = {obj} ")
-        for id, text in values:        
-            self.addItem(text, userData=id)
+        self.master_value = obj
+        self.query, self.params = self.selectQuery(master=True)
+        if not self.isPlainQuery():
+            # the detail cache holds unfiltered rows in database order
+            self.load(self.query, self.params)
+            return
+        records = self.link.cached(obj)
+        if records is not None:
+            if self.loader is not None:
+                self.loader.stop()
+            self.setRows(records)
+        else:
+            self.load(self.detailquery, (obj,), obj)
+
+    def cellEdited(self, row, column):
+        """
+        Keep the edited cell in self.edits until flush. Text that is not valid
+        for the column type is reverted.
+
+        This method is invoked via cellChanged signal. It is not expected to call it from application.
 
-            
-    def idxChanged(self):
         """
-        If another item  is selected, the id of that column emitted via self.signalMasterId.
+        if self.edits is None or row >= len(self.records):
+            return
+        record = self.records[row]
+        key = self.recordKey(record)
+        col = self.edits.table.columns[self.edits.columns[column]]
+        try:
+            value = col.convert(self.item(row, column).text())
+        except ValueError:
+            self.blockSignals(True)
+            self.item(row, column).setText(str(self.edits.originals.get(key, record)[column]))
+            self.blockSignals(False)
+            return
+        self.edits.set(key, record, col.name, value)
+        self.signalCellChange.emit(key)
+        if self.auto_flush > 0 and not self.flushtimer.isActive():
+            self.flushtimer.start(self.auto_flush)
+
+    def setAutoFlush(self, interval):
+        """
+        Write the edits automatically interval milliseconds after the first
+        unwritten edit, so the edits made meanwhile go in the same transaction.
+
+        Parameters
+        ----------
+
+        interval : int
+            Milliseconds to wait, 0 disables automatic writing.
 
         """
-        self.selected_id = self.itemData(self.currentIndex())
-        self.signalMasterId.emit(self.itemData(self.currentIndex()))
+        self.auto_flush = interval
+        if interval <= 0:
+            self.flushtimer.stop()
 
-                
-    def fill(self):
+    @instrumented
+    def flush(self):
         """
-        Fills the combobox from table rows.
+        Write all edited cells to the database in one transaction, see
+        EditBuffer.flush. Conflicting rows are reported with signalConflict,
+        with the key and the record as it is now in the database, None if it was deleted.
+        Their edits are dropped and the current values are shown, reapply
+        makes the edits pending again.
+
+        Returns
+        -------
+        Conflicts : dict
+            Current records of the conflicting rows by key.
 
         """
-        self.clear()
-        values = self.db.execute(self.dataquery)
-        for id, text in values:        
-            self.addItem(text, userData=id)
+        self.flushtimer.stop()
+        if self.edits is None or not self.edits.isDirty():
+            return {}
+        try:
+            written, conflicts = self.edits.flush()
+        except:
+            tb.print_exc()
+            print("Cannot write changes to ", self.table)
+            return {}
+        self.blockSignals(True)
+        for row, record in enumerate(self.records):
+            key = self.recordKey(record)
+            # joined display values are not edited, keep them
+            if key in written:
+                self.records[row] = written[key] + tuple(record[len(self.columns):])
+            elif key in conflicts and conflicts[key] is not None:
+                self.records[row] = conflicts[key] + tuple(record[len(self.columns):])
+                self.setCells(row, self.records[row])
+        self.blockSignals(False)
+        for key, record in conflicts.items():
+            self.signalConflict.emit(key, record)
+        return conflicts
+
+    def reapply(self, key):
+        """
+        Make the edits of a row rejected by flush as a conflict pending again,
+        over the values now in the database, and show them. They are written
+        by the next flush unless the row changed again.
 
+        """
+        if self.edits is None:
+            return
+        changes = self.edits.reapply(key)
+        if len(changes) == 0:
+            return
+        self.blockSignals(True)
+        for row, record in enumerate(self.records):
+            if self.recordKey(record) == tuple(key):
+                for column, value in changes.items():
+                    j = self.columns.index(column)
+                    self.setItem(row, j, self.cellItem(record[:j] + (value,) + record[j + 1:], j))
+        self.blockSignals(False)
+        self.signalCellChange.emit(tuple(key))
+        if self.auto_flush > 0 and not self.flushtimer.isActive():
+            self.flushtimer.start(self.auto_flush)
+
+    def rollback(self):
+        """
+        Drop all edits that are not written and show the values read from the database again.
 
-    def setMaster(self, otherwidget, mycolumn_name):
         """
-        Sets the master widget. The items in the combobox will be filtered with the value
+        self.flushtimer.stop()
+        if self.edits is None:
+            return
+        self.blockSignals(True)
+        for row, record in enumerate(self.records):
+            key = self.recordKey(record)
+            if self.edits.isDirty(key):
+                original = self.edits.originals[key]
+                for j in range(len(self.columns)):
+                    self.setItem(row, j, self.cellItem(original, j))
+        self.blockSignals(False)
+        self.edits.discard()
+
+    @instrumented
+    def export(self, path, format="csv", block_size=1000):
+        """
+        Write the rows the table shows to path, filtered by the current master
+        id if a master widget is set and by the filters, in the sort order. Rows are read from the database again
+        and streamed to the file block_size at a time, see Table.export.
+
+        Parameters
+        ----------
+
+        path : str
+            File to write.
+
+        format : str, optional
+            csv or jsonl. Default is csv
+
+        block_size : int, optional
+            Number of rows read with each fetchmany. Default is 1000
+
+        Returns
+        -------
+        Number of rows : int
+            Number of rows written.
+
+        """
+        header = self.headers
+        blocks = self.db.streamBlocks(self.query, self.params, block_size)
+        return exportBlocks(path, blocks, header, format)
+
+    def setNavigator(self, navigator):
+        """
+        Write the edits with the Ok button of a DBNavigatorWidget and drop them with its Cancel button.
+
+        """
+        navigator.signalAccept.connect(self.flush)
+        navigator.signalCancel.connect(self.rollback)
+
+    
+    @instrumented
+    def setMaster(self, otherwidget, mycolumn_name, other_table_column_to_display=None, cache_size=0, cache_bytes=None,
+                  preload=False, coalesce=None, coalesce_delay=150):
+        """
+        Sets the master widget. The values in the table widget will be filtered with the value
         comes from the master widget's signalMasterId signal.
 
         Raises exception if
@@ -99,8 +2349,30 @@ class DBComboBox(QComboBox):
         * Foreign key table name is not the same as master table name
         * Foreign key column name is not present inside master table.
 
-        :param otherwidget: Master widget that holds the master table.
-        :param mycolumn_name: Column name in the detail table.
+        Parameters
+        ----------
+
+        otherwidget: One of the DBWidgets
+            Master widget that holds the master table.
+
+        mycolumn_name:  str
+            Column name in the detail table.
+
+        cache_size : int, optional
+            Number of master ids to keep the rows of, 0 disables the cache. Default is 0
+
+        cache_bytes : int, optional
+            Memory limit of the cache in bytes.
+
+        preload : bool, optional
+            Read the whole detail table once, ordered by mycolumn_name, and serve
+            every master id from memory. Suits short master lists. Default is False
+
+        coalesce : str, optional
+            None, debounce or latest. Refill only for the last of a burst of master ids, see SignalCoalescer.
+
+        coalesce_delay : int, optional
+            Quiet time in milliseconds for debounce. Default is 150
 
         """
 
@@ -116,174 +2388,362 @@ class DBComboBox(QComboBox):
             if (mycolumn.foreign_key_column not in otherwidget.db.tables[otherwidget.table].columns.keys()):
                 raise Exception(f"Foreign key column {mycolumn.foreign_key_column} not found in {otherwidget.table}")
             else: # everything looks ok, create the connection
-                otherwidget.signalMasterId.connect(self.refill)
+                connectMaster(self, otherwidget, coalesce, coalesce_delay)
                 self.mastercolumn = mycolumn_name
+                # same statement text for every master value, so the database can reuse its plan
+                self.detailquery = f"{self.dataquery} where {self.table}.{self.mastercolumn} = {self.db.placeholder}"
+                preload_query = None
+                if preload:
+                    preload_query = (f"select {self.table}.{self.mastercolumn}, {self.selectlist} "
+                                     f"from {self.fromclause} order by {self.table}.{self.mastercolumn}")
+                self.link = MasterLink(self.db, self.table, self.detailquery, cache_size, cache_bytes, preload_query)
                 self.refill(otherwidget.selected_id)
-                
-class DBNavigatorWidget(QWidget):
+
+
+def masterSignal(widget):
     """
-    DBNavigatorWidget will provide a compound widget to display/edit/delete
-    individual rows from tables.
+    Return the signal of a master widget that carries the selected primary key.
+    DBComboBox emits signalMasterId, table widgets emit signalRowChanged.
 
     """
-    def __init__(self, parent, db, tablename):
-        super(DBNavigatorWidget, self).__init__(parent)
+    if isinstance(widget, (DBTableWidget, DBTableView)):
+        return widget.signalRowChanged
+    return widget.signalMasterId
+
+
+class DBTableModel(QAbstractTableModel):
+    """
+    DBTableModel provides the rows of a table to a QTableView. Rows are read
+    in blocks of block_size as the view scrolls, using canFetchMore / fetchMore,
+    instead of reading the whole result at once.
+
+    If the table has a primary key, blocks are read with a KeysetPager, each
+    block being an indexed primary key range query. Otherwise rows are read
+    from an open cursor.
+
+    Attributes
+    ----------
+
+    db : DB object
+        Database to connect to
+
+    table : str
+        Name of the table
+
+    block_size : int
+        Number of rows to read from the cursor on each fetchMore call.
+
+    rows : list
+        Rows read from the cursor so far.
+
+    offset : int
+        Row number of the first of rows. It is 0 unless the model was
+        positioned with seek, the rows before it are read when they are shown.
+
+    cursor : generator or None
+        Blocks of the query set with setQuery, see DB.streamBlocks. On Postgresql
+        the rows not read yet stay on the server.
+
+    """
+
+    def __init__(self, db, tablename, block_size=256, parent=None):
+        super(DBTableModel, self).__init__(parent)
         self.db = db
-        self.tablename = tablename
-        self.setupUi(self)
-        self.show()
+        self.table = tablename
+        self.block_size = block_size
+        self.headers = list(self.db.tables[self.table].columns.keys())
+        self.rows = []
+        self.offset = 0
+        self.cursor = None
+        self.pager = None
+        self.condition = None
+        self.params = ()
+
+    @instrumented
+    def setCondition(self, condition=None, params=()):
+        """
+        Reset the model and start reading the rows of the table that satisfy condition.
+        Only the first block is read here.
 
-    def setupUi(self, DBNavigatorWidget):
-        if DBNavigatorWidget.objectName():
-            DBNavigatorWidget.setObjectName(u"DBNavigatorWidget")
+        Parameters
+        ----------
 
-        self.verticalLayout = QVBoxLayout(DBNavigatorWidget)
-        self.verticalLayout.setObjectName(u"verticalLayout")
-        self.dbeditWidget = QWidget(DBNavigatorWidget)
-        self.dbeditWidget.setObjectName(u"dbeditWidget")
-        sizePolicy = QSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        sizePolicy.setHorizontalStretch(0)
-        sizePolicy.setVerticalStretch(0)
-        sizePolicy.setHeightForWidth(self.dbeditWidget.sizePolicy().hasHeightForWidth())
-        self.dbeditWidget.setSizePolicy(sizePolicy)
-        self.verticalLayout.addWidget(self.dbeditWidget)
-        self.horizontalLayout = QHBoxLayout()
-        self.horizontalLayout.setObjectName(u"horizontalLayout")
-        self.horizontalLayout.setSizeConstraint(QLayout.SetMinimumSize)
-        self.btnDBNavFirst = QPushButton(DBNavigatorWidget)
-        self.btnDBNavFirst.setObjectName(u"btnDBNavFirst")
-        self.horizontalLayout.addWidget(self.btnDBNavFirst)
-        self.btnDBNavPrev = QPushButton(DBNavigatorWidget)
-        self.btnDBNavPrev.setObjectName(u"btnDBNavPrev")
-        self.horizontalLayout.addWidget(self.btnDBNavPrev)
-        self.btnDBNavNext = QPushButton(DBNavigatorWidget)
-        self.btnDBNavNext.setObjectName(u"btnDBNavNext")
-        self.horizontalLayout.addWidget(self.btnDBNavNext)
-        self.btnDBNavLast = QPushButton(DBNavigatorWidget)
-        self.btnDBNavLast.setObjectName(u"btnDBNavLast")
-        self.horizontalLayout.addWidget(self.btnDBNavLast)
-        self.btnDBNavAdd = QPushButton(DBNavigatorWidget)
-        self.btnDBNavAdd.setObjectName(u"btnDBNavAdd")
-        self.horizontalLayout.addWidget(self.btnDBNavAdd)
-        self.btnDBNavDelete = QPushButton(DBNavigatorWidget)
-        self.btnDBNavDelete.setObjectName(u"btnDBNavDelete")
-        self.horizontalLayout.addWidget(self.btnDBNavDelete)
-        self.btnDBNavAccept = QPushButton(DBNavigatorWidget)
-        self.btnDBNavAccept.setObjectName(u"btnDBNavAccept")
-        self.horizontalLayout.addWidget(self.btnDBNavAccept)
-        self.verticalLayout.addLayout(self.horizontalLayout)
-        self.retranslateUi(DBNavigatorWidget)
-        self.btnDBNavFirst.clicked.connect(DBNavigatorWidget.DBNavFirst)
-        QMetaObject.connectSlotsByName(DBNavigatorWidget)
-    # setupUi
+        condition : str or None
+            Predicate to filter the rows, without WHERE.
 
-    def retranslateUi(self, DBNavigatorWidget):
-        DBNavigatorWidget.setWindowTitle(QCoreApplication.translate("DBNavigatorWidget", u"Form", None))
-        self.btnDBNavFirst.setText(QCoreApplication.translate("DBNavigatorWidget", u"<<", None))
-        self.btnDBNavPrev.setText(QCoreApplication.translate("DBNavigatorWidget", u"<", None))
-        self.btnDBNavNext.setText(QCoreApplication.translate("DBNavigatorWidget", u">", None))
-        self.btnDBNavLast.setText(QCoreApplication.translate("DBNavigatorWidget", u">>", None))
-        self.btnDBNavAdd.setText(QCoreApplication.translate("DBNavigatorWidget", u"+", None))
-        self.btnDBNavDelete.setText(QCoreApplication.translate("DBNavigatorWidget", u"-", None))
-        self.btnDBNavAccept.setText(QCoreApplication.translate("DBNavigatorWidget", u"Ok", None))
-    # retranslateUi
+        params : sequence
+            Values for the placeholders in condition.
 
-    def DBNavFirst(self):
-        pass
+        """
+        if len(self.db.tables[self.table].primaryKey()) == 0:
+            query_string = f"select * from {self.table}"
+            if condition is not None:
+                query_string += f" where {condition}"
+            # no primary key to page with, fall back to a plain cursor
+            self.setQuery(query_string, params)
+            return
+        self.beginResetModel()
+        self.close()
+        self.pager = KeysetPager(self.db, self.table, self.block_size, condition, params)
+        self.condition, self.params = condition, tuple(params)
+        self.rows = []
+        self.offset = 0
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    @instrumented
+    def setQuery(self, query_string, params=None):
+        """
+        Reset the model and start reading rows of query_string. Only the first block is read here.
 
-    def DBNavPrev(self):
-        pass
+        Parameters
+        ----------
 
-    def DBNavLast(self):
-        pass
+        query_string : str
+            Query to display on the model.
 
-    def DBNavNext(self):
-        pass
+        params : sequence or None
+            Values for the placeholders in query_string.
 
-    def DBNavNew(self):
-        pass
+        """
+        self.beginResetModel()
+        self.close()
+        self.rows = []
+        self.offset = 0
+        self.cursor = self.db.streamBlocks(query_string, params, self.block_size)
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def close(self):
+        """
+        Stop reading, close the open cursor if there is one.
+        This releases the connection held by the block generator.
 
-    def DBNavDelete(self):
-        pass
+        """
+        self.pager = None
+        if self.cursor is not None:
+            self.cursor.close()
+            self.cursor = None
 
-    def DBNavAccept(self):
-        pass
+    def record(self, row):
+        """
+        Return the row at given position as read from the database, None if
+        it does not exist any more. Rows before offset are read here.
 
+        """
+        if row < self.offset:
+            self.readBefore(row)
+            if row < self.offset:
+                return None
+        return self.rows[row - self.offset]
+
+    @instrumented
+    def seek(self, key):
+        """
+        Reset the model to start reading at the row of primary key key. Only the
+        position of the row, one count query on the primary key index, and its
+        block are read, the rows before it are read when they are shown.
 
+        Returns
+        -------
+        Row : int
+            Row of key, -1 if there is no such key. The model is not changed then.
 
-class DBTableWidget(QTableWidget):
+        """
+        if self.pager is None:
+            return -1
+        block = self.pager.seek(key)
+        if len(block) == 0 or self.pager.key(block[0]) != (key if isinstance(key, tuple) else (key,)):
+            return -1
+        row = self.pager.count(below=key)
+        self.beginResetModel()
+        self.rows = block
+        self.offset = row
+        if len(block) < self.block_size:
+            self.close()
+        self.endResetModel()
+        return row
+
+    @instrumented
+    def readBefore(self, row):
+        """
+        Read the rows from row to offset, at least one block of them, reading
+        backwards from the first row read.
+
+        """
+        if len(self.rows) == 0:
+            return
+        # the pager is closed once the last row is read
+        pager = KeysetPager(self.db, self.table, self.block_size, self.condition, self.params)
+        limit = min(self.offset, max(self.offset - row, self.block_size))
+        query_string, params = pager.statement(pager.key(self.rows[0]), "<", True, limit)
+        records = self.db.execute(query_string, params) or []
+        records.reverse()
+        self.rows[0:0] = records
+        self.offset -= len(records)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.offset + len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        record = self.record(index.row())
+        if record is None:
+            return None
+        return str(record[index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section]
+        return str(section + 1)
+
+    def canFetchMore(self, parent):
+        if parent.isValid():
+            return False
+        return (self.cursor is not None) or (self.pager is not None)
+
+    @instrumented
+    def fetchMore(self, parent):
+        if parent.isValid():
+            return
+        if self.pager is not None:
+            if len(self.rows) == 0:
+                block = self.pager.first()
+            else:
+                block = self.pager.after(self.pager.key(self.rows[-1]))
+        elif self.cursor is not None:
+            block = next(self.cursor, [])
+        else:
+            return
+        if len(block) < self.block_size:
+            self.close()
+        if len(block) > 0:
+            self.beginInsertRows(QModelIndex(), self.rowCount(), self.rowCount() + len(block) - 1)
+            self.rows.extend(block)
+            self.endInsertRows()
+
+
+class DBTableView(QTableView):
     """
-    DBTableWidget provides a QTableWidget with a table.
+    DBTableView is a DBTableWidget variant for large tables. Rows are kept in a
+    DBTableModel and read from the database in blocks as the user scrolls.
+    It has the same signals, setMaster and refill methods as DBTableWidget,
+    so it can replace DBTableWidget in existing applications.
 
     Attributes
     ----------
 
     parent : QWidget
-        The parent widget on user interface to put the DBTableWidget on.
+        The parent widget on user interface to put the DBTableView on.
 
     db : DB object
         Database to connect to
 
     table : str
-        Name of the table to display on DBTableWidget
+        Name of the table to display on DBTableView
 
     dataquery : str
-        Default SQL query to fill the DBTableWidget
+        Default SQL query to fill the DBTableView
 
-    current_id : Variable
-        The selected row's primary key value
+    default_id : Variable, optional
+        Primary key value of the row to select first, see selectId.
+
+    block_size : int, optional
+        Number of rows to read from the database at once. Default is 256
 
     """
     signalCellChange = Signal(object)
     signalMasterId = Signal(object)
     signalRowChanged = Signal(object)
 
-    def __init__(self, parent,  db, tablename, default_id = None, ):
-        super(DBTableWidget,self).__init__(parent)
+    def __init__(self, parent, db, tablename, default_id=None, block_size=256):
+        super(DBTableView, self).__init__(parent)
         sizePolicy = QSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.setSizePolicy(sizePolicy)
         self.current_row = None
         self.selected_id = None
+        self.current_id = None
+        self.mastercolumn = None
         self.db = db
         self.setFixedWidth(parent.width())
         self.table = tablename
         self.dataquery = f"select  * from {self.table}"
-        self.clear()
-        self.current_id = None
+        self.tablemodel = DBTableModel(self.db, self.table, block_size, self)
+        self.setModel(self.tablemodel)
+        self.tablemodel.setCondition()
+        self.clicked.connect(self.indexClicked)
+        if default_id is not None and self.selectId(default_id):
+            return
+        if self.tablemodel.rowCount() > 0:
+            self.selected_id = self.tablemodel.record(0)[0]
+            self.current_row = 0
+
+    def selectId(self, id_value):
+        """
+        Select and show the row whose first column is id_value. With a primary
+        key on the first column the model is positioned at the row with one
+        count query on the key, see DBTableModel.seek, and only its block is
+        read. Otherwise blocks are read until the row is found.
 
-        records = self.db.execute(self.dataquery)
-        self.setRowCount(len(records))
-        self.setColumnCount(len(self.db.tables[self.table].columns.keys()))
+        Returns
+        -------
+        Found : bool
+            True if the row is selected.
 
-        self.setHorizontalHeaderLabels( self.db.tables[self.table].columns.keys())
-        i=0
-        for record in records:
-            j=0
-            for k in record:
-                self.setItem(i, j,QTableWidgetItem( str(k)))                              
-                j+=1
-            i+=1
-        self.cellClicked.connect(self.check_row)
-        self.selected_id = int(self.itemAt(0,0).text())
-        self.current_row = 0
+        """
+        model = self.tablemodel
+        row = -1
+        for i in range(model.offset, model.rowCount()):
+            if model.record(i)[0] == id_value:
+                row = i
+                break
+        if row < 0 and self.db.tables[self.table].primaryKey() == model.headers[:1] and model.pager is not None:
+            row = model.seek(id_value)
+        elif row < 0:
+            # no key order to seek with, read until the row is found
+            checked = model.rowCount()
+            while row < 0 and model.canFetchMore(QModelIndex()):
+                model.fetchMore(QModelIndex())
+                row = next((i for i in range(checked, model.rowCount()) if model.record(i)[0] == id_value), -1)
+                checked = model.rowCount()
+        if row < 0:
+            return False
+        self.selectRow(row)
+        self.scrollTo(model.index(row, 0))
+        self.selected_id = id_value
+        self.current_row = row
+        return True
+
+    def indexClicked(self, index):
+        self.check_row(index.row(), index.column())
 
     def check_row(self, x, y):
         """
         Check if the selected row is changed.
         Set selected_id attribute to that row's primary key value
 
-        This method is invoked via cellClicked signal. It is not expected to call it from application.
+        This method is invoked via clicked signal. It is not expected to call it from application.
 
         """
         if x != self.current_row:
-            self.signalRowChanged.emit(int(self.item(x,0).text()))
-            self.selected_id = int(self.item(x,0).text())
-            self.current_row = int(self.item(x,0).text())
-
+            self.selected_id = self.tablemodel.record(x)[0]
+            self.current_row = x
+            self.signalRowChanged.emit(self.selected_id)
 
-    def refill(self,obj):
+    @instrumented
+    def refill(self, obj):
         """
-        If a master widget is defined for this widget, change the contents of the DBTableWidget using
+        If a master widget is defined for this widget, change the contents of the DBTableView using
         the foreign key from master widget.
 
         Parameters
@@ -293,28 +2753,19 @@ class DBTableWidget(QTableWidget):
             Foreign key value emitted from master widget.
 
         """
-        self.clear()
-        records = self.db.execute(self.dataquery + f" where {self.mastercolumn} = {obj} ")
-        self.setRowCount(len(records))
-
-        i=0
-        for record in records:
-            j=0
-            for k in record:
-                self.setItem(i, j,QTableWidgetItem( str(k)))                              
-                j+=1
-            i+=1
-                
-    def cellChanged(self):
-        print(self.currentRow(), self.currentColumn(), self.currentItem().text())
-        pass                
+        self.current_row = None
+        self.tablemodel.setCondition(f"{self.mastercolumn} = {self.db.placeholder}", (obj,))
 
-    
-    def setMaster(self, otherwidget, mycolumn_name, other_table_column_to_display=None):
+    def setMaster(self, otherwidget, mycolumn_name, other_table_column_to_display=None, cache_size=0, cache_bytes=None,
+                  preload=False, coalesce=None, coalesce_delay=150):
         """
-        Sets the master widget. The values in the table widget will be filtered with the value
+        Sets the master widget. The values in the table view will be filtered with the value
         comes from the master widget's signalMasterId signal.
 
+        The parameters are the same as DBTableWidget.setMaster, so calls written for it
+        work unchanged. other_table_column_to_display, cache_size, cache_bytes and preload
+        are not used: the rows of each master id are read in blocks, not cached.
+
         Raises exception if
 
         * There is no foreign key in the current table,
@@ -330,25 +2781,26 @@ class DBTableWidget(QTableWidget):
         mycolumn_name:  str
             Column name in the detail table.
 
+        coalesce : str, optional
+            None, debounce or latest. Refill only for the last of a burst of master ids, see SignalCoalescer.
+
+        coalesce_delay : int, optional
+            Quiet time in milliseconds for debounce. Default is 150
+
         """
 
         mycolumn = self.db.tables[self.table].columns[mycolumn_name]
         # check if requested connection is valid
         if ( mycolumn.foreign_key_table is None ):
-            raise Exception(f"Requested connection between {self.table.name} and {otherwidget.table.name} cannot be made, no foreign key for {mycolumn_name} defined.")
-        
+            raise Exception(f"Requested connection between {self.table} and {otherwidget.table} cannot be made, no foreign key for {mycolumn_name} defined.")
+
         elif ( mycolumn.foreign_key_table != otherwidget.table):
             raise Exception(f"Requested connection between {self.table} and {otherwidget.table} cannot be made, wrong table name")
 
-        elif ( mycolumn.foreign_key_table == otherwidget.table): # check existence of foreign key column
-            if (mycolumn.foreign_key_column not in otherwidget.db.tables[otherwidget.table].columns.keys()):
-                raise Exception(f"Foreign key column {mycolumn.foreign_key_column} not found in {otherwidget.table}")
-            else: # everything looks ok, create the connection
-                tp = type(otherwidget)
-                
-                if  tp  is DBComboBox:
-                    otherwidget.signalMasterId.connect(self.refill)
-                if tp is DBTableWidget:                    
-                    otherwidget.signalRowChanged.connect(self.refill)
-                self.mastercolumn = mycolumn_name
-                self.refill(otherwidget.selected_id)
\ No newline at end of file
+        elif (mycolumn.foreign_key_column not in otherwidget.db.tables[otherwidget.table].columns.keys()):
+            raise Exception(f"Foreign key column {mycolumn.foreign_key_column} not found in {otherwidget.table}")
+
+        else: # everything looks ok, create the connection
+            connectMaster(self, otherwidget, coalesce, coalesce_delay)
+            self.mastercolumn = mycolumn_name
+            self.refill(otherwidget.selected_id)
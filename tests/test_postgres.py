@@ -0,0 +1,42 @@
+"""
+Tests against a Postgresql server. Set DBWIDGETS_POSTGRES to the unix socket
+directory of the server to run them, they are skipped otherwise.
+
+    DBWIDGETS_POSTGRES=/var/run/postgresql python -m pytest tests
+
+"""
+import os
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from dbwidgets import DBPostgres
+
+SOCKET = os.environ.get("DBWIDGETS_POSTGRES")
+
+pytestmark = pytest.mark.skipif(SOCKET is None, reason="DBWIDGETS_POSTGRES is not set")
+
+
+@pytest.fixture
+def db():
+    db = DBPostgres(dbname=os.environ.get("DBWIDGETS_POSTGRES_DB", "postgres"),
+                    username=os.environ.get("DBWIDGETS_POSTGRES_USER", "postgres"), unix_socket=SOCKET)
+    with db.transaction() as cur:
+        cur.execute("drop table if exists dbwidgets_stream_test")
+        cur.execute("create table dbwidgets_stream_test (id integer primary key, name varchar)")
+        cur.execute("insert into dbwidgets_stream_test select i, 'name ' || i from generate_series(1, 2500) i")
+    yield db
+    with db.transaction() as cur:
+        cur.execute("drop table dbwidgets_stream_test")
+    db.close()
+
+
+def test_execute_during_stream(db):
+    # every execute ends its read with a rollback, the held cursor of the stream must survive it
+    count = 0
+    for id_value, name in db.stream("select id, name from dbwidgets_stream_test order by id", block_size=100):
+        assert db.execute("select name from dbwidgets_stream_test where id = %s", (id_value,)) == [(name,)]
+        count += 1
+    assert count == 2500
+    assert db.stats()["errors"] == 0